@@ -1,3 +1,3 @@
-from .bot_assistant_launcher import main
+from .bot_assistant_launcher import main, server_main
 
-__all__ = ['main']
\ No newline at end of file
+__all__ = ['main', 'server_main']
\ No newline at end of file
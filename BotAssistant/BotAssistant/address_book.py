@@ -1,14 +1,48 @@
-from collections import UserDict
-from datetime import datetime
+from array import array
+from collections import OrderedDict, UserDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import wraps
 from db_connector import FileConnectorFactory
-from dateutil.parser import parse
+from indexes import BirthdayIndex, FuzzyIndex, NameIndex, NotesIndex, PhoneIndex, SearchIndex, birthday_histogram, birthday_keys, tokenize
+from itertools import islice
+from parallel_scan import PARALLEL_MIN_RECORDS, ParallelScanner, split_shards
+from renderer import RendererFactory, write_pages
+from rwlock import ReadWriteLock
+from stats import STATS
+import pickle
 import re
+import sys
+import threading
+import time
 
 
 # Rows per page for printing pages
 ROWS_PER_PAGE = 10
+# Storage type used by default (see FileConnectorFactory)
+STORAGE_TYPE = 'journal'
+# Amount of contacts found by fuzzy search
+FUZZY_RESULTS = 10
+# Amount of query results kept by the book (see cached_query)
+QUERY_CACHE_SIZE = 128
+# Results with more contacts are not cached (they hold references to a large part of the book)
+CACHED_RESULT_MAX = 10000
+
+
+# Results of the query method of the book are cached until the book is changed (see AddressBook._cached_result).
+# Callers must not change the results
+def cached_query(method):
+    @wraps(method)
+    def cached(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(kwargs.items()))
+        return self._cached_result(key, lambda: method(self, *args, **kwargs))
+    return cached
 
 class Field:
+    # Fields are stored without instance dictionary to save memory
+    __slots__ = ('__value',)
+
     def __init__(self, value):
         if not self.is_valid(value):
             raise ValueError(f"Value {type(self).__name__} is not valid")
@@ -30,87 +64,202 @@ class Field:
     
     def __repr__(self) -> str:
         return str(self.value)
+
+    def __getstate__(self):
+        return self.__value
+
+    def __setstate__(self, state):
+        # Fields pickled by older versions keep the value in instance dictionary
+        if isinstance(state, dict):
+            state = state['_Field__value']
+        self.__value = state
     
     # Validation of fields
     def is_valid(self, value)->bool:
         return bool(value)
    
 class Birthday(Field):
+    # Date parsed from the value, so the value is parsed once
+    __slots__ = ('_date',)
+
     def is_valid(self, birthday)->bool:
-        # Check if it is possible to convert exact string (fuzzy = False) to date
+        # Check if it is possible to convert exact string (fuzzy = False) to date,
+        # the date is kept for the value that is being set
         try:
-            birthday_date = parse(birthday, fuzzy=False)
-            print(birthday_date)
+            self._date = parse_date(birthday)
             return True
-        except ValueError:
+        except (ValueError, OverflowError):
             return False
 
+    def to_date(self) -> date:
+        try:
+            return self._date
+        except AttributeError:
+            # Birthdays recovered from file are parsed on first use
+            self._date = parse_date(self.value)
+            return self._date
+
+
+# Dates like 2000-12-31, 31.12.2000 or 12/31/2000
+DATE_FORMAT = re.compile(r'(\d{4})-(\d{2})-(\d{2})|(\d{1,2})([./-])(\d{1,2})\5(\d{4})')
+
+# Parse date the same way as dateutil (fuzzy = False). Common formats are parsed without dateutil,
+# it's imported on first use only
+def parse_date(text: str) -> date:
+    match = DATE_FORMAT.fullmatch(text)
+    if match is None:
+        from dateutil.parser import parse
+        return parse(text, fuzzy=False).date()
+    if match[1]:
+        return date(int(match[1]), int(match[2]), int(match[3]))
+    # Month goes first, unless it can't be a month (as in dateutil)
+    month, day = int(match[4]), int(match[6])
+    if month > 12 and day <= 12:
+        month, day = day, month
+    return date(int(match[7]), month, day)
+
+
+# Date of the birthday in specified year (29 February is celebrated on 1 March in non leap years)
+def birthday_in_year(birthday: date, year: int) -> date:
+    try:
+        return birthday.replace(year=year)
+    except ValueError:
+        return date(year, 3, 1)
+
 
 class Name(Field):
-    pass
+    __slots__ = ()
 
 class Notes(Field):
-    pass    
+    __slots__ = ()
 
 class Phone(Field):
+    __slots__ = ()
     
     def is_valid(self, phone)->bool:
         return bool(re.match(r'^\d{10}$', phone))
 
+    # Phone is kept in Record as integer, so it's valid and is restored without validation
+    @classmethod
+    def from_number(cls, number: int):
+        phone = cls.__new__(cls)
+        phone._Field__value = f"{number:010}"
+        return phone
+
    
 class Record:
+    # Phones are packed as integers (10 digits), tags are interned, so the record is compact
+    __slots__ = ('name', 'birthday', '_phones', 'notes', '_book')
+
     def __init__(self, name, birthday:Birthday=""):
         self.name = Name(name)       
         if birthday:
             self.birthday = Birthday(birthday)
         else: 
             self.birthday = None
-        self.phones = []
+        self._phones = array('Q')
+        self.notes = {}
+        # Address book the record belongs to (set by AddressBook.add_record)
+        self._book = None
+
+    # Tuple of Phone objects (change phones with add_phone, edit_phone and remove_phone or assign a new list,
+    # the tuple can't be changed, since changes of a copy would be lost)
+    @property
+    def phones(self):
+        return tuple(Phone.from_number(number) for number in self._phones)
+
+    @phones.setter
+    def phones(self, phones):
+        numbers = array('Q', (int(phone.value) for phone in phones))
+        self._changing()
+        self._phones = numbers
+        self._changed()
+
+    # Phone numbers as strings (without creating Phone objects)
+    def phone_numbers(self) -> list:
+        return [f"{number:010}" for number in self._phones]
+
+    # Notify the address book that the record is going to be changed (see AddressBook._record_changing)
+    def _changing(self):
+        if self._book is not None:
+            self._book._record_changing(self.name.value, self)
+
+    # Notify the address book about the change of the record
+    def _changed(self):
+        if self._book is not None:
+            self._book._record_changed(self)
+
+    # The record is pickled without its address book
+    def __getstate__(self):
+        return {'name': self.name, 'birthday': self.birthday, '_phones': self._phones, 'notes': self.notes}
+
+    def __setstate__(self, state):
+        # Records saved by older versions have no notes and keep phones as list of Phone objects
         self.notes = {}
+        self._book = None
+        for key, value in state.items():
+            setattr(self, key, value)
 
     def add_phone(self, phone):
         phone = Phone(phone)        
-        self.phones.append(phone)
+        if self._book is not None:
+            self._book.check_phone(self.name.value, phone.value)
+        self._changing()
+        self._phones.append(int(phone.value))
+        self._changed()
 
     def add_note(self, note, tag=""):
         if note not in self.notes:
-            self.notes[note] = tag
+            self._changing()
+            self.notes[note] = sys.intern(tag)
+            self._changed()
 
     def edit_note(self, note_old, note_new):        
         if note_old in self.notes:
+            self._changing()
             self.notes[note_new] = self.notes[note_old]
             self.notes.pop(note_old)
+            self._changed()
         else: 
             raise ValueError(f"Note {note_old} not found")
 
     def edit_tag(self, note, tag):
-        if (note in self.notes) and (self.notes[tag] != tag):
-            self.notes[note] = tag
+        if (note in self.notes) and (self.notes[note] != tag):
+            self._changing()
+            self.notes[note] = sys.intern(tag)
+            self._changed()
         else:
             raise ValueError(f"Note {note} not found")
 
     def delete_note(self, note):
+        if note not in self.notes:
+            raise KeyError(note)
+        self._changing()
         self.notes.pop(note)
+        self._changed()
 
     def add_birthday(self, birthday):
-        self.birthday = Birthday(birthday)        
+        birthday = Birthday(birthday)
+        self._changing()
+        self.birthday = birthday
+        self._changed()
 
     # Calculate days to birthday
     def days_to_birthday(self)->int:
         if self.birthday:
-            birthday = self.birthday.value
+            birthday = self.birthday.to_date()
         else: 
             birthday = None
         if birthday:        
             current_date = datetime.now().date()
-            birthday_date_this_year = parse(birthday, fuzzy=False).replace(year = datetime.now().year).date()
+            birthday_date_this_year = birthday_in_year(birthday, current_date.year)
             delta = birthday_date_this_year - current_date
             # If birthdate in future current year
             if delta.days>0:
                 return delta.days
             else: 
                 # If birthdate in current year has passed (calculate days to next year's date)
-                return (birthday_date_this_year.replace(year=current_date.year+1) - current_date).days
+                return (birthday_in_year(birthday, current_date.year+1) - current_date).days
         else:
             return None
     
@@ -118,122 +267,639 @@ class Record:
     
     def edit_phone(self, phone_old, phone_new):
         phone_new = Phone(phone_new)
-        for i, phone in enumerate(self.phones):
-            if phone.value == phone_old:
-                self.phones[i] = phone_new                
-                return
-        raise ValueError("Phone not found")
+        if self.find_phone(phone_old) is None:
+            raise ValueError("Phone not found")
+        if self._book is not None:
+            self._book.check_phone(self.name.value, phone_new.value)
+        self._changing()
+        self._phones[self._phones.index(int(phone_old))] = int(phone_new.value)
+        self._changed()
     
+    # Phones are kept as numbers, so the phone is looked up without creating Phone objects
     def find_phone(self, phone):        
-        for phone_item in self.phones:
-            if phone_item.value == phone:
-                return phone_item
+        if re.match(r'^\d{10}$', phone) and int(phone) in self._phones:
+            return Phone(phone)
         return None    
     
     
     def remove_phone(self, phone):
-        for phone_item in self.phones:
-            if phone_item.value == phone:
-                self.phones.remove(phone_item)
+        if self.find_phone(phone) is not None:
+            number = int(phone)
+            self._changing()
+            self._phones = array('Q', (item for item in self._phones if item != number))
+            self._changed()
 
     def __str__(self):
         birthday_txt=""        
         if self.birthday:
-            birthday_txt = f"birthday: {self.birthday}, "
-        return f"Contact name: {self.name}, {birthday_txt}phones: {'; '.join(p.value for p in self.phones)}"
+            birthday_txt = f"birthday: {self.birthday.value}, "
+        return f"Contact name: {self.name.value}, {birthday_txt}phones: {'; '.join(self.phone_numbers())}"
     
 
 class AddressBook(UserDict):
+    # Connector the book was recovered with, it persists changes of the book
+    _connector = None
+
+    def __init__(self, *args, **kwargs):
+        self._init_state()
+        super().__init__(*args, **kwargs)
+
+    # State of the book that is not pickled
+    def _init_state(self):
+        # Indexes by type, built on first use (see _index)
+        self._indexes = {}
+        # Incremented on every change, the book is dirty while version differs from saved_version
+        self.version = 0
+        self.saved_version = 0
+        # Changes that are not passed to the connector yet: name -> record (None if deleted), see deferred_changes
+        self._pending = None
+        # Scanner of the book by several processes and the thread that creates it (see parallel_search)
+        self._scanner = None
+        self._scanner_lock = threading.Lock()
+        self._scanner_thread = None
+        # Commands that change the book take the lock for writing, others for reading (see BotCLI.execute_command)
+        self.lock = ReadWriteLock()
+        # Results of queries (see cached_query), the least recently used first. Results are kept for one
+        # version of the book: every change increments the version, so they are dropped on the next query
+        self._results = OrderedDict()
+        self._results_version = 0
+        self._results_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.saved_version
+
+    # Contacts can't share phone numbers if True (see check_phone)
+    unique_phones = False
+    # Amount of processes that scan large books (0 - scan by the calling thread), see parallel_search
+    parallel_workers = 0
+    # Amount of cached query results (0 - results are not cached)
+    query_cache_size = QUERY_CACHE_SIZE
+
+    # Result of the query from the cache or computed by compute(). Queries are executed by several threads
+    # (under read lock of the book), so the cache has its own lock. Birthday queries depend on the current date,
+    # so the date is a part of the key
+    def _cached_result(self, key, compute):
+        if not self.query_cache_size:
+            return compute()
+        key = (*key, date.today())
+        with self._results_lock:
+            if self._results_version != self.version:
+                self._results.clear()
+                self._results_version = self.version
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.cache_hits += 1
+                return self._results[key]
+            self.cache_misses += 1
+            version = self.version
+        result = compute()
+        if len(result) <= CACHED_RESULT_MAX:
+            with self._results_lock:
+                if self._results_version == version:
+                    self._results[key] = result
+                    if len(self._results) > self.query_cache_size:
+                        self._results.popitem(last=False)
+        return result
+
+    # Raise ValueError if the phone belongs to another contact (only if unique_phones is set).
+    # Imported contacts (add_records) are not checked
+    def check_phone(self, name: str, phone: str):
+        if self.unique_phones:
+            owners = [owner for owner in self.whois(phone) if owner != name]
+            if owners:
+                raise ValueError(f"Phone {phone} already belongs to {owners[0]}")
+
+    # Names of contacts that have the phone number
+    def whois(self, phone: str) -> list:
+        return self._index(PhoneIndex).search(phone)
+
     def add_record(self, record: Record):
         if not record.name:
             return
+        for phone in record.phone_numbers():
+            self.check_phone(record.name.value, phone)
+        self._record_changing(record.name.value, self.data.get(record.name.value))
         self.data[record.name.value] = record
+        record._book = self
+        self._record_changed(record)
+
+    # Add many records at once, changes are persisted together
+    def add_records(self, records):
+        changes = []
+        for record in records:
+            if not record.name:
+                continue
+            name = record.name.value
+            self._record_changing(name, self.data.get(name))
+            self.data[name] = record
+            record._book = self
+            for index in self._indexes.values():
+                index.update(name, record)
+            changes.append((name, record))
+        self.version += 1
+        self._log_changes(changes)
 
     def find(self, name:str):
         return  self.data.get(name, None)
     
     def delete(self, name:str):        
-            self.pop(name, None)
+            record = self.data.get(name)
+            if record is not None:
+                self._record_changing(name, record)
+                del self.data[name]
+                record._book = None
+                for index in self._indexes.values():
+                    index.remove(name)
+                self.version += 1
+                self._log_changes([(name, None)])
+
+    # Called before the contact is changed, added (record is the replaced one or None) or deleted.
+    # The connector keeps the state of the contact the changes are based on (see BinaryFileDBConnector.merge)
+    def _record_changing(self, name: str, record):
+        if self._connector:
+            self._connector.before_change(name, record)
+
+    # Called by the records of the book on every change
+    def _record_changed(self, record: Record):
+        for index in self._indexes.values():
+            index.update(record.name.value, record)
+        self.version += 1
+        self._log_changes([(record.name.value, record)])
+
+    # Pass changes to the connector (or keep them until the end of deferred_changes block)
+    def _log_changes(self, changes):
+        if self._pending is not None:
+            self._pending.update(changes)
+        elif self._connector:
+            if len(changes) == 1:
+                self._connector.log_change(self, *changes[0])
+            else:
+                self._connector.log_changes(self, changes)
+
+    # Changes made inside the block are passed to the connector together when the block ends,
+    # only the last state of every changed contact is persisted (see BotCLI.run_batch)
+    @contextmanager
+    def deferred_changes(self):
+        self._pending = {}
+        try:
+            yield
+        finally:
+            changes, self._pending = self._pending, None
+            if changes and self._connector:
+                self._connector.log_changes(self, list(changes.items()))
+
+    # Get index of specified type, index is built on first use and kept up to date afterwards
+    def _index(self, index_type):
+        index = self._indexes.get(index_type)
+        if index is None:
+            index = index_type()
+            index.build(((name, None) for name in self.data) if index.names_only else self.data.items())
+            self._indexes[index_type] = index
+        return index
+
+    # Only contacts are pickled, the connector and indexes are set up on recovery
+    def __getstate__(self):
+        return {'data': self.data}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+        for record in self.data.values():
+            record._book = self
+
     # print AddressBook using pagination
-    def print_book(self):
-        cnt = 1
-        # Getting rows_per_page
-        for rows in self:
-            print(f"page {cnt}")
-            # Pages count
-            cnt+=1
-            for row in rows:
-                # Print rows on the page
-                print(row)
-
-    def save_address_book(self):
+    # (starting from <page> (0-based), <count> pages, by name or in order of adding)
+    # in format of RendererFactory (text, table, json) to file (stdout by default)
+    def print_book(self, page: int = 0, by_name: bool = False, count: int = None, output_format: str = 'text', file=None):
+        renderer = RendererFactory().get_renderer(output_format)
+        write_pages(islice(self.pages(page, by_name), count), file or sys.stdout, renderer, page + 1)
+
+    def save_address_book(self, storage_type=STORAGE_TYPE):
         # can be rewriten by adding needed file type to FileConnectorFactory
-        serialization_type = FileConnectorFactory().get_connector('binary')
+        serialization_type = self._connector or FileConnectorFactory().get_connector(storage_type)
         
+        version = self.version
+        start = time.perf_counter()
         # Can be specified parameter for file storate
         serialization_type.save_data(self)
+        STATS.record_storage('save', time.perf_counter() - start)
+        self.saved_version = version
 
-    def recover_address_book(self):
-        deserialization_type = FileConnectorFactory().get_connector('binary')
+    # Recover the default book or the named book (see FileConnector.book_filename)
+    def recover_address_book(self, storage_type=STORAGE_TYPE, book_name=None):
+        deserialization_type = FileConnectorFactory().get_connector(storage_type, book_name)
         
+        start = time.perf_counter()
         # Can be specified parameter for file storate
         data = deserialization_type.retreive_data()       
-        if data:
-            return data
+        STATS.record_storage('load', time.perf_counter() - start)
+        if data is not None:
+            address_book = data
         else:
-            return AddressBook()
+            address_book = AddressBook()
+        # Further changes of the book are persisted by the same connector
+        address_book._connector = deserialization_type
+        return address_book
         
     # Get address book with all contacts, that have birthdays in <days> days
     def show_birthday(self, days:int):        
+        return self.show_birthdays_within(days, days)
+
+    # Get address book with all contacts, that have birthdays within <days> days
+    # (or from <first_day> to <days> days), ordered by birthday
+    @cached_query
+    def show_birthdays_within(self, days:int, first_day:int=1):
         contacts = AddressBook()
-        for name, record in self.data.items():
-            if record.days_to_birthday():
-                if record.days_to_birthday() - int(days) == 0:
-                    contacts[name] = record
+        for name in self._index(BirthdayIndex).names(int(first_day), int(days)):
+            contacts[name] = self.data[name]
 
         return contacts
 
+    # Maximal amount of weeks of birthday histogram (birthdays are counted within a year, see birthday_keys)
+    MAX_WEEKS = 52
+
+    # Amount of contacts that have birthdays in each of <weeks> weeks starting tomorrow.
+    # Contacts are counted by days of year (see BirthdayIndex), not one by one
+    @cached_query
+    def birthday_histogram(self, weeks: int) -> list:
+        weeks = self._check_weeks(weeks)
+        return birthday_histogram(weeks, self._index(BirthdayIndex).count)
+
+    def _check_weeks(self, weeks) -> int:
+        weeks = int(weeks)
+        if not 1 <= weeks <= self.MAX_WEEKS:
+            raise ValueError(f"Amount of weeks must be from 1 to {self.MAX_WEEKS}")
+        return weeks
+
+    # (days to birthday, name) of contacts with birthdays within <days> days, the nearest first
+    @cached_query
+    def upcoming_birthdays(self, days: int) -> list:
+        return list(self._index(BirthdayIndex).upcoming(1, int(days)))
+
+    @cached_query
     def search_records(self, text: str) -> dict:
         search_results = {}
-        for name, record in self.data.items():
+        text_lower = text.lower()
+        # Only records that contain all trigrams of the text are checked
+        candidates = self._index(SearchIndex).search(text)
+        if candidates is None:
+            names = self.parallel_search(text)
+            if names is not None:
+                return AddressBook({name: self.data[name] for name in names})
+            records = self.data.items()
+        else:
+            records = ((name, self.data[name]) for name in candidates)
+        for name, record in records:
             # Check if the text is a substring of the name
-            if text.lower() in name.lower():
+            if text_lower in name.lower():
                 search_results[name] = record
             else:
                 # Check if the text is a substring of any phone number
-                for phone in record.phones:
-                    if text in phone.value:
+                for phone in record.phone_numbers():
+                    if text in phone:
                         search_results[name] = record
                         break  # Stop searching if a match is found in any phone number               
 
         return AddressBook(search_results)    
     
+    # Address book with <count> contacts which names are the most similar to the text (typos are allowed),
+    # the most similar first
+    @cached_query
+    def fuzzy_search(self, text: str, count: int = FUZZY_RESULTS):
+        return AddressBook({name: self.data[name] for _, name in self._index(FuzzyIndex).search(text, count)})
+
+    # Names of records that contain the text (as search_records), found by parallel_workers processes.
+    # None if parallel scan is disabled, the book is too small for it or the scanner of the current version
+    # of the book is not ready yet (the book is scanned by the calling thread meanwhile)
+    def parallel_search(self, text: str):
+        if not self.parallel_workers or len(self.data) < PARALLEL_MIN_RECORDS:
+            return None
+        with self._scanner_lock:
+            if self._scanner is None or self._scanner.version != self.version:
+                self.start_scanner()
+                return None
+            # Searches use all workers, so they are not run at the same time
+            return self._scanner.search(text)
+
+    # Create the scanner of the current version of the book by background thread (unless it's being created).
+    # Starting processes and sending them the book is slow, so searches don't wait for it (unless <wait>)
+    # and use the scanner when its processes are ready
+    def start_scanner(self, wait: bool = False):
+        thread = self._scanner_thread
+        if thread is None or not thread.is_alive():
+            thread = self._scanner_thread = threading.Thread(target=self._create_scanner, name="scanner", daemon=True)
+            thread.start()
+        if wait:
+            thread.join()
+
+    def _create_scanner(self):
+        # Records are read while no command changes the book, the processes are started and load their shards
+        # without the lock
+        with self.lock.read():
+            version = self.version
+            names, shards = split_shards(self.data.items(), self.parallel_workers)
+        scanner = ParallelScanner(names, shards, version)
+        with self._scanner_lock:
+            scanner, self._scanner = self._scanner, scanner
+        if scanner is not None:
+            scanner.close()
+
+    # Get address book with contacts which notes contain words of the text, the most relevant first
+    @cached_query
+    def search_notes(self, text: str):
+        return AddressBook({name: self.data[name] for name in self._index(NotesIndex).search(text)})
+
+    # Get address book with contacts that have notes with the tag
+    @cached_query
+    def search_tag(self, tag: str):
+        return AddressBook({name: self.data[name] for name in self._index(NotesIndex).search_tag(tag)})
+
     def __iter__(self):        
-        return Iterable(ROWS_PER_PAGE, self.data)
+        return self.pages()
+
+    # Pages of the book starting from <page> (0-based), ordered by name or in order of adding
+    def pages(self, page: int = 0, by_name: bool = False):
+        start = page * ROWS_PER_PAGE
+        if by_name:
+            # Position of the page in sorted names is known, previous pages are not read
+            names = self._index(NameIndex).names(start)
+        else:
+            names = islice(self.data, start, None)
+        return Iterable(ROWS_PER_PAGE, self.data, names, page)
 
 class Iterable:
-    def __init__(self, n: int, book: AddressBook):
+    # Cursor over the records of the book, each page is read from <names> when requested
+    def __init__(self, n: int, book: AddressBook, names=None, page: int = 0):
         self.n = n
         self.book = book
-        # Total number of records
-        self.number_of_records = len(book)
+        # Names of records in order of pages (order of adding by default)
+        self.names = iter(book) if names is None else names
         # number of page
-        self.page = 0    
+        self.page = page
+
+    def __iter__(self):
+        return self
 
     def __next__(self):
-        # Define start and end records of the page
-        start = self.page * self.n
-        end = min((self.page + 1) * self.n, self.number_of_records)
+        # Take next <n> records, only the records of the page are read
+        page_records = [self.book[name] for name in islice(self.names, self.n)]
 
-        # If start record exceeds total number of records throw StopIteration exception to finish generation
-        # The rest of the code won't be exectuted if the next starting record number exeeds the total number
-        if start >= self.number_of_records:
+        # If there are no records left throw StopIteration exception to finish generation
+        if not page_records:
             raise StopIteration
 
-        # Convert to list and slice needed amount of the dict records (from start to end)
-        page_records = list(self.book.values())[start:end]
         # Increment page count
         self.page += 1
-        # Here we can return page_records and self.page as a tuple, to use it in print method, but IMHO it's a little bit overhead 
-        # And it will make the code less readable
-        return page_records
\ No newline at end of file
+        return page_records
+
+
+# Mapping of contact names to records read on demand from SQLiteDBConnector.
+# Recently used records are cached, so the same Record object is returned while it is in use
+class SQLiteRecords(MutableMapping):
+    # Amount of cached records
+    CACHE_SIZE = 1024
+
+    def __init__(self, book: AddressBook, connector):
+        self.book = book
+        self.connector = connector
+        self.cache = OrderedDict()
+        # Cache is changed on reading, reads can be done by several threads (see server)
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name in self.cache:
+                self.cache.move_to_end(name)
+                return self.cache[name]
+            row = self.connector.read_record(name)
+            if row is None:
+                raise KeyError(name)
+            birthday, phones, notes = row
+            record = Record(name, birthday or "")
+            record.phones = [Phone(phone) for phone in phones]
+            record.notes = notes
+            record._book = self.book
+            self._cache(name, record)
+            return record
+
+    # Records are persisted by connector.log_change, the mapping only keeps them cached
+    def __setitem__(self, name, record):
+        with self.lock:
+            self._cache(name, record)
+
+    def __delitem__(self, name):
+        with self.lock:
+            self.cache.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.cache or self.connector.contains(name)
+
+    def __iter__(self):
+        return self.connector.names()
+
+    def __len__(self):
+        return self.connector.count()
+
+    def _cache(self, name, record):
+        self.cache[name] = record
+        self.cache.move_to_end(name)
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+
+# Address book stored in SQLite data base. Records are loaded only when needed,
+# search and birthday queries are executed by the data base
+class SQLiteAddressBook(AddressBook):
+    def __init__(self, connector):
+        super().__init__()
+        self.data = SQLiteRecords(self, connector)
+        self._connector = connector
+
+    # Queries of the data base must see the changes, so they are written at once, but committed together
+    @contextmanager
+    def deferred_changes(self):
+        with self._connector.transaction():
+            yield
+
+    def pages(self, page: int = 0, by_name: bool = False):
+        names = self._connector.names(by_name, page * ROWS_PER_PAGE)
+        return Iterable(ROWS_PER_PAGE, self.data, names, page)
+
+    # Notes that contain words of the text are selected by data base and ranked by NotesIndex
+    @cached_query
+    def search_notes(self, text: str):
+        index = NotesIndex()
+        for name, notes in self._connector.notes_with_words(tokenize(text)).items():
+            index.add_notes(name, notes)
+        return AddressBook({name: self.data[name] for name in index.search(text)})
+
+    @cached_query
+    def search_tag(self, tag: str):
+        return AddressBook({name: self.data[name] for name in self._connector.tag_names(tag)})
+
+    @cached_query
+    def show_birthdays_within(self, days:int, first_day:int=1):
+        contacts = AddressBook()
+        for _, (month, day) in birthday_keys(int(first_day), int(days)):
+            for name in sorted(self._connector.birthday_names(month, day)):
+                contacts[name] = self.data[name]
+        return contacts
+
+    @cached_query
+    def search_records(self, text: str) -> dict:
+        return AddressBook({name: self.data[name] for name in self._connector.search_names(text)})
+
+    def whois(self, phone: str) -> list:
+        return self._connector.phone_names(phone)
+
+    @cached_query
+    def birthday_histogram(self, weeks: int) -> list:
+        weeks = self._check_weeks(weeks)
+        counts = self._connector.birthday_counts()
+        return birthday_histogram(weeks, lambda month, day: counts.get((month, day), 0))
+
+    @cached_query
+    def upcoming_birthdays(self, days: int) -> list:
+        return [(days_left, name) for days_left, (month, day) in birthday_keys(1, int(days))
+                for name in sorted(self._connector.birthday_names(month, day))]
+
+
+# Mapping of contact names to records decoded on demand from the file of MmapFileDBConnector.
+# Records that were read or changed are kept in memory (changes are saved with the whole book),
+# names of deleted and added contacts are tracked until the file is written again
+class MmapRecords(MutableMapping):
+    # Amount of cached records that were read from the file and not changed
+    CACHE_SIZE = 1024
+
+    def __init__(self, book: AddressBook, connector):
+        self.book = book
+        self.connector = connector
+        self.file = None
+        # Records added or changed since the file was written: name -> record (kept until the book is saved)
+        self.changed = {}
+        # Recently read records (as in SQLiteRecords), the same Record object is returned while it is in use
+        self.cache = OrderedDict()
+        # Records are decoded and cached on reading, reads can be done by several threads (see server)
+        self.lock = threading.Lock()
+        self.reopen()
+
+    # Map the file again (after it's written), changed records are in the file now and are only cached
+    def reopen(self):
+        if self.file is not None:
+            self.file.close()
+        self.file = self.connector.open_file()
+        for name, record in self.changed.items():
+            self._cache(name, record)
+        self.changed = {}
+        # Names that are in the file, but deleted from the book
+        self.deleted = set()
+        # Names that are not in the file, in order of adding
+        self.added = {}
+        self.size = self.file.count if self.file else 0
+
+    def _position(self, name):
+        if self.file is None or name in self.deleted:
+            return None
+        return self.file.find(name)
+
+    def __getitem__(self, name):
+        record = self.changed.get(name)
+        if record is not None:
+            return record
+        with self.lock:
+            record = self.cache.get(name)
+            if record is not None:
+                self.cache.move_to_end(name)
+                return record
+            position = self._position(name)
+            if position is None:
+                raise KeyError(name)
+            record = self.file.record(position)
+            record._book = self.book
+            self._cache(name, record)
+            return record
+
+    def __setitem__(self, name, record):
+        if name not in self:
+            self.size += 1
+            if name in self.deleted:
+                self.deleted.discard(name)
+            else:
+                self.added[name] = None
+        self.pin(name, record)
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self.changed.pop(name, None)
+        with self.lock:
+            self.cache.pop(name, None)
+        if name in self.added:
+            del self.added[name]
+        else:
+            self.deleted.add(name)
+        self.size -= 1
+
+    def __contains__(self, name):
+        return name in self.changed or self._position(name) is not None
+
+    # Names in order of adding (contact that was deleted and added again keeps its place)
+    def __iter__(self):
+        if self.file is not None:
+            for name in self.file.names_in_order():
+                if name not in self.deleted:
+                    yield name
+        yield from list(self.added)
+
+    def __len__(self):
+        return self.size
+
+    # Keep the changed record in memory until the book is saved
+    def pin(self, name, record):
+        self.changed[name] = record
+        with self.lock:
+            self.cache.pop(name, None)
+
+    def _cache(self, name, record):
+        self.cache[name] = record
+        self.cache.move_to_end(name)
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    # True if there are no added or deleted contacts since the file was written
+    def unchanged(self) -> bool:
+        return not self.added and not self.deleted
+
+    # Function that returns pickled record by name (see MmapFileDBConnector.save_data),
+    # records that were not changed are copied from the file without decoding
+    def payload_reader(self):
+        positions = {name: position for position, name in enumerate(self.file.names())} if self.file else {}
+        def payload(name):
+            record = self.changed.get(name)
+            if record is None:
+                return self.file.payload(positions[name])
+            return pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        return payload
+
+
+# Address book stored in memory mapped file. Opening the book doesn't depend on its size,
+# a contact is decoded when it's used (find, phone, pages)
+class MmapAddressBook(AddressBook):
+    def __init__(self, connector):
+        super().__init__()
+        self.data = MmapRecords(self, connector)
+        self._connector = connector
+
+    # Changed record is kept in memory, so it's not dropped from the cache before the book is saved
+    def _record_changed(self, record: Record):
+        self.data.pin(record.name.value, record)
+        super()._record_changed(record)
+
+    # Pages by name are read from the sorted index of the file while it has all contacts of the book
+    def pages(self, page: int = 0, by_name: bool = False):
+        if by_name and self.data.file is not None and self.data.unchanged():
+            return Iterable(ROWS_PER_PAGE, self.data, self.data.file.names(page * ROWS_PER_PAGE), page)
+        return super().pages(page, by_name)
@@ -0,0 +1,62 @@
+from address_book import AddressBook
+import threading
+import time
+
+
+# Seconds between saves of the changed book
+AUTOSAVE_INTERVAL = 5
+# Amount of changes that triggers save before the interval ends
+AUTOSAVE_CHANGES = 100
+# How often (seconds) the amount of changes is checked
+CHECK_INTERVAL = 0.5
+
+
+# Background thread that saves the changed (dirty) book on interval or after amount of changes.
+# The book is saved by the connector it was recovered with (file is written to temporary file and renamed)
+class AutoSaver(threading.Thread):
+    def __init__(self, book: AddressBook, interval: float = AUTOSAVE_INTERVAL, changes: int = AUTOSAVE_CHANGES):
+        super().__init__(name="autosave", daemon=True)
+        self.book = book
+        self.interval = interval
+        self.changes = changes
+        self.stopped = threading.Event()
+
+    def run(self):
+        last_save = time.monotonic()
+        while not self.stopped.wait(min(self.interval, CHECK_INTERVAL)):
+            pending = self.book.version - self.book.saved_version
+            if pending and (pending >= self.changes or time.monotonic() - last_save >= self.interval):
+                self.save()
+                last_save = time.monotonic()
+
+    # The book is copied under the read lock (see FileConnector.snapshot) and the copy is written without the lock,
+    # so commands are not blocked while the file is written. Books that can't be copied (mmap, sqlite) are saved
+    # under the write lock: the mmap book maps the new file after it's written, so reading commands must not run
+    def save(self):
+        connector = self.book._connector
+        with self.book.lock.read():
+            version = self.book.version
+            snapshot = connector.snapshot(self.book)
+        if snapshot is None:
+            with self.book.lock.write():
+                self.book.save_address_book()
+            return
+        state = connector.save_snapshot(snapshot)
+        # Commands log changes to the connector under the write lock
+        with self.book.lock.read():
+            connector.restore_save_state(self.book, state)
+        self.book.saved_version = version
+
+    # Stop the thread (waits for the save in progress)
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# Start autosave for the book if its connector doesn't persist every change
+def start_autosave(book: AddressBook):
+    if book._connector is None or book._connector.saves_changes:
+        return None
+    saver = AutoSaver(book)
+    saver.start()
+    return saver
@@ -0,0 +1,33 @@
+from address_book import AddressBook, Record
+import random
+
+
+FIRST_NAMES = ["Olena", "Taras", "Iryna", "Andrii", "Oksana", "Dmytro", "Natalia", "Serhii", "Kateryna", "Oleh",
+               "Mariia", "Yurii", "Sofiia", "Bohdan", "Anna", "Maksym", "Yulia", "Ivan", "Viktoriia", "Petro"]
+LAST_NAMES = ["Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk", "Oliinyk", "Lysenko",
+              "Marchenko", "Moroz", "Savchenko", "Rudenko", "Pavlenko", "Boiko", "Kozak", "Ponomarenko"]
+NOTE_WORDS = ["call", "meeting", "birthday", "gift", "project", "invoice", "dinner", "trip", "book", "doctor",
+              "school", "review", "contract", "football", "concert", "coffee", "deadline", "report", "visit", "party"]
+TAGS = ["work", "family", "friends", "health", "sport", "travel", "finance", ""]
+
+
+# Generate <count> synthetic records: every contact has 1-3 phones, 60% have birthday, 50% have 1-3 notes.
+# The same seed gives the same records
+def generate_records(count: int, seed: int = 1):
+    rnd = random.Random(seed)
+    for i in range(count):
+        record = Record(f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {i}")
+        for _ in range(rnd.randint(1, 3)):
+            record.add_phone(f"{rnd.randrange(10**10):010}")
+        if rnd.random() < 0.6:
+            record.add_birthday(f"{rnd.randint(1, 28):02}.{rnd.randint(1, 12):02}.{rnd.randint(1940, 2010)}")
+        if rnd.random() < 0.5:
+            for _ in range(rnd.randint(1, 3)):
+                record.add_note(" ".join(rnd.sample(NOTE_WORDS, 3)), rnd.choice(TAGS))
+        yield record
+
+
+def generate_book(count: int, seed: int = 1) -> AddressBook:
+    book = AddressBook()
+    book.add_records(generate_records(count, seed))
+    return book
@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import time
+
+from server import END_OF_RESPONSE
+
+
+# One client: adds contacts and reads them (<reads> read commands per write), returns amount of commands
+async def run_client(client: int, commands: int, reads: int, host: str, port: int, unix_path: str = None) -> int:
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    name = f"load{client}"
+    for i in range(commands):
+        if i % (reads + 1) == 0:
+            command = f"add {name} {client % 10000:04}{i:06}"
+        elif i % 2:
+            command = f"phone {name}"
+        else:
+            command = f"search {name}"
+        writer.write(f"{command}\n".encode())
+        await writer.drain()
+        # Wait for the whole response (the server may close the connection)
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError(f"Client {client}: server closed the connection")
+            if line.decode().rstrip('\n') == END_OF_RESPONSE:
+                break
+    writer.write(b"exit\n")
+    await writer.drain()
+    writer.close()
+    return commands
+
+
+async def run(clients: int, commands: int, reads: int, host: str, port: int, unix_path: str = None):
+    start = time.perf_counter()
+    done = await asyncio.gather(*(run_client(client, commands, reads, host, port, unix_path) for client in range(clients)))
+    elapsed = time.perf_counter() - start
+    total = sum(done)
+    print(f"{total} commands from {clients} clients in {elapsed:.2f}s: {total / elapsed:.0f} commands/second")
+
+
+# Start the server first: python bot_assistant_launcher.py server
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test of the bot server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="path of Unix socket (instead of TCP)")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--commands', type=int, default=200, help="commands per client")
+    parser.add_argument('--reads', type=int, default=3, help="read commands per write command")
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.commands, args.reads, args.host, args.port, args.unix))
@@ -0,0 +1,19 @@
+import sys
+import tracemalloc
+
+from benchmarks.generator import generate_book
+
+
+# Memory used by address book (bytes per contact)
+def bytes_per_contact(count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    book = generate_book(count)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(book.data)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{count} contacts: {bytes_per_contact(count):.0f} bytes per contact")
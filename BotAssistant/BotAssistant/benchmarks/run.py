@@ -0,0 +1,150 @@
+from contextlib import redirect_stdout
+from datetime import datetime
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from address_book import AddressBook, QUERY_CACHE_SIZE
+from benchmarks.generator import generate_records
+from db_connector import BinaryFileDBConnector, CompactFileDBConnector
+
+
+# Sizes of synthetic books used by default
+SIZES = [1000, 10000, 100000]
+# Queries of search command: name (3+ letters uses index), phone digits, short text (scan)
+SEARCH_QUERIES = ["shev", "olena", "12345", "0987", "an"]
+# Query of fuzzy command (with a typo)
+FUZZY_QUERY = "olena shevcenko"
+
+
+# Run func <repeat> times, returns seconds of the fastest run
+def timed(func, repeat: int = 1) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def result(size: int, benchmark: str, seconds: float, ops: int = 1, **extra) -> dict:
+    return dict(size=size, benchmark=benchmark, seconds=seconds, ops=ops, us_per_op=seconds / ops * 1e6, **extra)
+
+
+# Benchmarks of address book with <size> contacts, returns list of results
+def run_size(size: int, repeat: int, workers: int = 0) -> list:
+    results = []
+    records = list(generate_records(size))
+
+    book = AddressBook()
+    seconds = timed(lambda: [book.add_record(record) for record in records])
+    results.append(result(size, "add_record", seconds, size))
+    # Queries are repeated, so they are measured without the cache of results (see cached queries below)
+    book.query_cache_size = 0
+
+    # The first search builds the index
+    results.append(result(size, "search_records (first, builds index)", timed(lambda: book.search_records(SEARCH_QUERIES[0]))))
+    for query in SEARCH_QUERIES:
+        seconds = timed(lambda: book.search_records(query), repeat)
+        results.append(result(size, f"search_records {query}", seconds, found=len(book.search_records(query).data)))
+
+    results.append(result(size, "fuzzy_search (first, builds index)", timed(lambda: book.fuzzy_search(FUZZY_QUERY))))
+    seconds = timed(lambda: book.fuzzy_search(FUZZY_QUERY), repeat)
+    results.append(result(size, f"fuzzy_search {FUZZY_QUERY}", seconds))
+
+    if workers:
+        book.parallel_workers = workers
+        query = SEARCH_QUERIES[-1]
+        results.append(result(size, f"parallel scanner (starts {workers} processes)", timed(lambda: book.start_scanner(wait=True))))
+        seconds = timed(lambda: book.search_records(query), repeat)
+        results.append(result(size, f"search_records {query} parallel", seconds, found=len(book.search_records(query).data)))
+        book.parallel_workers = 0
+
+    results.append(result(size, "show_birthday (first, builds index)", timed(lambda: book.show_birthday(7))))
+    seconds = timed(lambda: [book.show_birthday(days) for days in range(1, 31)], repeat)
+    results.append(result(size, "show_birthday 1..30", seconds, 30))
+    seconds = timed(lambda: book.show_birthdays_within(30), repeat)
+    results.append(result(size, "show_birthdays_within 30", seconds))
+    seconds = timed(lambda: book.upcoming_birthdays(30), repeat)
+    results.append(result(size, "upcoming_birthdays 30", seconds))
+    seconds = timed(lambda: book.birthday_histogram(52), repeat)
+    results.append(result(size, "birthday_histogram 52 weeks", seconds))
+
+    # The same queries with the cache of results: the first run of every query misses, the rest hit
+    book.query_cache_size = QUERY_CACHE_SIZE
+    def cached_queries():
+        for query in SEARCH_QUERIES:
+            book.search_records(query)
+        book.show_birthdays_within(30)
+    seconds = timed(cached_queries, repeat)
+    results.append(result(size, "cached queries", seconds, len(SEARCH_QUERIES) + 1,
+                          hits=book.cache_hits, misses=book.cache_misses))
+    book.query_cache_size = 0
+
+    # Pages are printed to memory, so the time of formatting is measured (not of the terminal)
+    def print_book(**kwargs):
+        with redirect_stdout(io.StringIO()):
+            book.print_book(**kwargs)
+    results.append(result(size, "print_book", timed(print_book, repeat), size))
+    for output_format in ('table', 'json'):
+        results.append(result(size, f"print_book ({output_format})", timed(lambda: print_book(output_format=output_format), repeat), size))
+    last_page = (size - 1) // 10
+    results.append(result(size, "print_book last page by name", timed(lambda: print_book(page=last_page, by_name=True, count=1), repeat)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "phone_book.dat")
+        connector = BinaryFileDBConnector()
+        seconds = timed(lambda: connector.save_data(book, filename), repeat)
+        results.append(result(size, "save (binary)", seconds, bytes=os.path.getsize(filename)))
+        seconds = timed(lambda: connector.retreive_data(filename), repeat)
+        results.append(result(size, "recover (binary)", seconds))
+        # The same book in compact format (see codec module) without and with compression
+        for compress, label in ((False, "compact"), (True, "compact zlib")):
+            filename = os.path.join(directory, f"phone_book_{compress}.bab")
+            connector = CompactFileDBConnector(filename, compress)
+            seconds = timed(lambda: connector.save_data(book, filename), repeat)
+            results.append(result(size, f"save ({label})", seconds, bytes=os.path.getsize(filename)))
+            seconds = timed(lambda: connector.retreive_data(filename), repeat)
+            results.append(result(size, f"recover ({label})", seconds))
+    return results
+
+
+def print_results(results: list, file=sys.stderr):
+    for item in results:
+        file_size = f" {item['bytes']:>12} bytes" if 'bytes' in item else ""
+        print(f"{item['size']:>8} {item['benchmark']:<40} {item['seconds'] * 1000:>10.2f} ms {item['us_per_op']:>12.2f} us/op{file_size}", file=file)
+
+
+# python -m benchmarks.run --sizes 1000 100000 --output results.json
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks of address book on synthetic books")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="amounts of contacts")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of every benchmark (the fastest is taken)")
+    parser.add_argument('--output', help="JSON file for results (printed to stdout if not set)")
+    parser.add_argument('--parallel', type=int, default=0, metavar='WORKERS',
+                        help="also run parallel scan with WORKERS processes (books from PARALLEL_MIN_RECORDS contacts)")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        size_results = run_size(size, args.repeat, args.parallel)
+        print_results(size_results)
+        results.extend(size_results)
+
+    report = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
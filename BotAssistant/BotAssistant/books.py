@@ -0,0 +1,95 @@
+from address_book import AddressBook, STORAGE_TYPE
+from autosave import start_autosave
+from collections import OrderedDict
+import re
+import threading
+
+
+# Book used when no book is selected (files res/phone_book.*)
+DEFAULT_BOOK = 'phone_book'
+# Estimated memory of loaded books (bytes) after which the least recently used books are unloaded
+MEMORY_BUDGET = 512 * 1024 * 1024
+# Estimated memory of a contact of the book loaded to memory (see benchmarks/memory_report.py)
+BYTES_PER_CONTACT = 700
+# Books of SQLite and mmap storages keep only used records in memory
+LAZY_BOOK_BYTES = 1024 * 1024
+# Names of books are names of files
+BOOK_NAME = re.compile(r'[\w-]+')
+
+
+# Loaded book with its autosave and amount of bots that use it
+class LoadedBook:
+    def __init__(self, book: AddressBook, autosaver):
+        self.book = book
+        self.autosaver = autosaver
+        self.users = 0
+
+    # Estimated memory of the book
+    def size(self) -> int:
+        if isinstance(self.book.data, dict):
+            return len(self.book.data) * BYTES_PER_CONTACT
+        return LAZY_BOOK_BYTES
+
+
+# Named address books loaded on demand. Books are kept in order of use, when estimated memory of
+# loaded books exceeds the budget, the least recently used books are saved and unloaded.
+# Books used by a bot (see acquire and release) are not unloaded
+class BookCache:
+    def __init__(self, storage_type=STORAGE_TYPE, memory_budget=MEMORY_BUDGET, autosave=True):
+        self.storage_type = storage_type
+        self.memory_budget = memory_budget
+        self.autosave = autosave
+        # name -> LoadedBook, the least recently used first
+        self.books = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Book with the name, loaded if needed. The book is used until release is called
+    def acquire(self, name: str = DEFAULT_BOOK) -> AddressBook:
+        if not BOOK_NAME.fullmatch(name):
+            raise ValueError(f"Book name {name} can contain only letters, digits, _ and -")
+        with self.lock:
+            loaded = self.books.get(name)
+            if loaded is None:
+                book = AddressBook().recover_address_book(self.storage_type, name)
+                loaded = LoadedBook(book, start_autosave(book) if self.autosave else None)
+                self.books[name] = loaded
+            self.books.move_to_end(name)
+            loaded.users += 1
+            self._evict()
+            return loaded.book
+
+    def release(self, name: str):
+        with self.lock:
+            loaded = self.books.get(name)
+            if loaded is not None and loaded.users:
+                loaded.users -= 1
+
+    # Names of loaded books, the most recently used first
+    def loaded(self) -> list:
+        with self.lock:
+            return list(reversed(self.books))
+
+    # Unload the least recently used books that are not used until the books fit the budget
+    def _evict(self):
+        total = sum(loaded.size() for loaded in self.books.values())
+        for name in list(self.books):
+            if total <= self.memory_budget:
+                break
+            loaded = self.books[name]
+            if loaded.users:
+                continue
+            total -= loaded.size()
+            self._unload(name)
+
+    # The book is not used by bots (or they are stopped), so it's saved without locking
+    def _unload(self, name: str):
+        loaded = self.books.pop(name)
+        if loaded.autosaver:
+            loaded.autosaver.stop()
+        loaded.book.save_address_book()
+
+    # Save and unload all books (on exit, when commands are not executed anymore)
+    def close(self):
+        with self.lock:
+            for name in list(self.books):
+                self._unload(name)
@@ -1,5 +1,25 @@
-from address_book import AddressBook, Record
+from address_book import Record, ROWS_PER_PAGE, STORAGE_TYPE
+from books import DEFAULT_BOOK, MEMORY_BUDGET, BookCache
+from import_export import export_records, import_records
+from renderer import RendererFactory
+from stats import STATS
 from abc import ABC, abstractclassmethod
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+import io
+import os
+import sys
+import time
+
+# Commands that save changes and stop the bot
+EXIT_COMMANDS = ["good bye", "close", "exit"]
+# Commands that change the address book
+WRITE_COMMANDS = {'add', 'change', 'delete', 'set_birthday', 'set_note', 'update_note', 'delete_note', 'update_tag', 'import'}
+# Output of batch mode is written after every BATCH_FLUSH_EVERY commands
+BATCH_FLUSH_EVERY = 1000
+# Weeks shown by birthdays_per_week by default and width of its bars
+HISTOGRAM_WEEKS = 8
+HISTOGRAM_WIDTH = 40
 
 class Command(ABC):
     
@@ -31,6 +51,11 @@ class Command(ABC):
     def get_phone(self, *args)->str:
         pass
     
+    # Get contacts that have the phone (command: whois)
+    @abstractclassmethod
+    def find_owner(self, *args)->str:
+        pass
+
     @abstractclassmethod
     def remove(self, *args)->str:
         pass
@@ -40,16 +65,76 @@ class Command(ABC):
     def filter_contacts(self, *args)->str:
         pass
 
+    # Contacts with names similar to the text (command: fuzzy)
+    @abstractclassmethod
+    def filter_similar(self, *args)->str:
+        pass
+
+    # Filter contacts by words of notes
+    @abstractclassmethod
+    def filter_notes(self, *args)->str:
+        pass
+
+    # Filter contacts by tag of notes
+    @abstractclassmethod
+    def filter_tag(self, *args)->str:
+        pass
+
     # Filter contacts that have birthday in specified amount of days
     @abstractclassmethod
     def show_birthdays(self, *args):
         pass
+
+    # Filter contacts that have birthday within specified amount of days
+    @abstractclassmethod
+    def show_birthdays_within(self, *args):
+        pass
     
+    # Contacts that have birthday within specified amount of days with days left (command: upcoming)
+    @abstractclassmethod
+    def show_upcoming_birthdays(self, *args):
+        pass
+
+    # Amount of birthdays per week (command: birthdays_per_week)
+    @abstractclassmethod
+    def show_birthday_histogram(self, *args):
+        pass
+
     # Print all contacts in the data base (command: show all)
     @abstractclassmethod
     def display(self):
         pass
 
+    # Print page of contacts ordered by name (command: page)
+    @abstractclassmethod
+    def display_page(self, *args):
+        pass
+
+    # Import contacts from CSV or JSONL file (command: import)
+    @abstractclassmethod
+    def import_contacts(self, *args):
+        pass
+
+    # Export contacts to CSV or JSONL file (command: export)
+    @abstractclassmethod
+    def export_contacts(self, *args):
+        pass
+
+    # Show statistics of commands (command: stats)
+    @abstractclassmethod
+    def show_stats(self, *args):
+        pass
+
+    # Select the named address book (command: use)
+    @abstractclassmethod
+    def use_book(self, *args):
+        pass
+
+    # Set format of printed contacts (command: format)
+    @abstractclassmethod
+    def set_output_format(self, *args):
+        pass
+
     # Save the data to file and stop working with bot
     @abstractclassmethod
     def quit_bot(self):
@@ -74,9 +159,26 @@ class Command(ABC):
 
 
 class BotCLI(Command):
-    def __init__(self):    
-        self.phone_book = AddressBook()    
-        self.phone_book = self.phone_book.recover_address_book()
+    # phone_book can be provided to work with one address book, books - to share loaded named books
+    # between several bots (see server). Otherwise the bot loads named books itself.
+    # Import and export can be disabled (file_commands) or limited to files of files_dir
+    def __init__(self, storage_type=STORAGE_TYPE, phone_book=None, autosave=True, output_format='text',
+                 books=None, memory_budget=MEMORY_BUDGET, file_commands=True, files_dir=None):    
+        # Format of printed contacts (see RendererFactory)
+        self.output_format = output_format
+        self.file_commands = file_commands
+        self.files_dir = files_dir
+        # Named books (see use command), None if the bot works with provided phone_book only
+        self.books = None
+        self.book_name = None
+        # Books loaded by the bot are saved by it on exit (shared books are saved by their owner)
+        self.own_books = False
+        if phone_book is None:
+            self.own_books = books is None
+            self.books = BookCache(storage_type, memory_budget, autosave) if books is None else books
+            self.book_name = DEFAULT_BOOK
+            phone_book = self.books.acquire(DEFAULT_BOOK)
+        self.phone_book = phone_book
 
     # Handling errors (Decorator implementation)
     def input_error(func):
@@ -98,6 +200,8 @@ class BotCLI(Command):
                     return "Provide name and phone"
                 else:
                     return str(e)        
+            except OSError as e:
+                return f"File error: {e}"
         return inner
 
     # Handlers
@@ -114,13 +218,26 @@ class BotCLI(Command):
         delete <contact name> - delete contact or delete <contact name> <phone> - delete specified phone for the contact \n
         set_birthday <contact name> <birthday date> - adds birthday to specified contact \n
         days_to_birthday <number of days> - shows all contacts that have birthday in specified number of days \n
+        birthdays_within <number of days> - shows all contacts that have birthday within specified number of days \n
+        upcoming <number of days> - shows days left to birthdays within specified number of days, the nearest first \n
+        birthdays_per_week <number of weeks (optional)> - shows amount of birthdays in each of the next weeks \n
         set_note <contact name> <note> <tag (optional)>  - adds note for the contact (if exists overwrite) \n
         update_note <contact name> <note> - updates note or adds new one if not present (if updated, tag ramains the same) \n
         delete_note <contact_name> <note> - removes note for specified contact \n
         update_tag <contact_name> <note> <new_tag> updates tag for the specified note \n
         phone <contact name> - get contact phones by name \n
+        whois <phone> - get contacts that have the phone \n
         show all - prints contact book \n
+        page <page number> - prints page of contact book ordered by name \n
         search <substring> - filter by name letters or phone number sequence \n
+        search_notes <words> - filter by words of notes (the most relevant first) \n
+        fuzzy <name> - contacts with the most similar names, typos are allowed (the most similar first) \n
+        search_tag <tag> - filter by tag of notes \n
+        import <file> - imports contacts from .csv (name,phones,birthday,notes) or .jsonl file \n
+        export <file> - exports all contacts to .csv or .jsonl file \n
+        format <text|table|json> - sets format of printed contacts \n
+        use <book> - switches to the named address book (phone_book by default), shows current book without name \n
+        stats [on|off|reset] - shows calls and latencies of commands, enables, disables or resets statistics \n
         exit, good bye, close - saves changes to database and exit \n
         """
 
@@ -128,9 +245,7 @@ class BotCLI(Command):
     @input_error
     def set_contact(self, commands)->str:    
         if commands[1] in self.phone_book:
-            phonelist = [str(phone) for phone in self.phone_book.find(commands[1]).phones]
-            #TODO check false case   
-            if commands[2] in phonelist:
+            if self.phone_book[commands[1]].find_phone(commands[2]) is not None:
                 raise ValueError(f"Contact with such name ({commands[1]}) and phone ({commands[2]})already exists.")
             else:
                 self.phone_book[commands[1]].add_phone(commands[2])
@@ -152,11 +267,11 @@ class BotCLI(Command):
     @input_error
     def update_phone(self, commands)->str:    
         if commands[1] in self.phone_book:
-            phonelist = [str(phone) for phone in self.phone_book.find(commands[1]).phones]
-            if (commands[2] not in phonelist) and (commands[3] in phonelist):
+            record = self.phone_book.find(commands[1])
+            if (record.find_phone(commands[2]) is None) and (record.find_phone(commands[3]) is not None):
                 raise ValueError(f"Check command values. Phone {commands[2]} is not found! or phone {commands[3]} is present in contact phones")
             else:
-                self.phone_book[commands[1]].edit_phone(commands[2], commands[3])
+                record.edit_phone(commands[2], commands[3])
             
             return f"Contact {commands[1]} phone number {commands[2]} is changed to {commands[3]}"
         else:
@@ -167,7 +282,16 @@ class BotCLI(Command):
     def get_phone(self, commands)->str:
         if commands[1] not in self.phone_book:
             raise ValueError(f"Contact with such name ({commands[1]}) not present in Address Book.")
-        return f" The contact {commands[1]} has phone numbers: {[str(phone) for phone in self.phone_book.find(commands[1]).phones]}"
+        return f" The contact {commands[1]} has phone numbers: {self.phone_book.find(commands[1]).phone_numbers()}"
+
+    # Get names of contacts that have the phone (command: whois)
+    @input_error
+    def find_owner(self, commands)->str:
+        owners = self.phone_book.whois(commands[1])
+        if not owners:
+            return f"No contact has phone {commands[1]}"
+        return f"Phone {commands[1]} belongs to: {', '.join(owners)}"
+
     # Delete phone from contact's phone list
 
     @input_error
@@ -175,9 +299,7 @@ class BotCLI(Command):
         if commands[1] in self.phone_book:
             record = self.phone_book.find(commands[1])
             if len(record.phones) > 1:
-                for phone in record.phones:
-                    if str(phone)==commands[2]:
-                        record.phones.remove(phone)
+                record.remove_phone(commands[2])
             else:
                 raise ValueError("Unable to delete last phone from phone list")
         else:
@@ -188,12 +310,42 @@ class BotCLI(Command):
     # Filter by name or phone number 
     @input_error
     def filter_contacts(self, commands)->str:
-        # TODO add search by note
         address_book =  self.phone_book.search_records(commands[1])
         if not address_book:
             print(f"No contacts found that match criteria {commands[1]}")
         else:
-            address_book.print_book()
+            address_book.print_book(output_format=self.output_format)
+
+    # Contacts which names are the most similar to the text, typos are allowed (the most similar first)
+    @input_error
+    def filter_similar(self, commands)->str:
+        text = " ".join(commands[1:])
+        if not text:
+            raise ValueError("Provide a name to search")
+        address_book = self.phone_book.fuzzy_search(text)
+        if not address_book:
+            print(f"No contacts found with names similar to {text}")
+        else:
+            address_book.print_book(output_format=self.output_format)
+
+    # Filter by words of notes (the most relevant contacts first)
+    @input_error
+    def filter_notes(self, commands)->str:
+        text = " ".join(commands[1:])
+        address_book = self.phone_book.search_notes(text)
+        if not address_book:
+            print(f"No contacts found with notes that match {text}")
+        else:
+            address_book.print_book(output_format=self.output_format)
+
+    # Filter by tag of notes
+    @input_error
+    def filter_tag(self, commands)->str:
+        address_book = self.phone_book.search_tag(commands[1])
+        if not address_book:
+            print(f"No contacts found with notes tagged {commands[1]}")
+        else:
+            address_book.print_book(output_format=self.output_format)
 
     # Filter contacts that have birthday in specified amount of days
     @input_error
@@ -202,20 +354,146 @@ class BotCLI(Command):
         if not contact_birthdays:
             print(f"No contacts with birthdays in {commands[1]} days")
         else:
-            contact_birthdays.print_book()
+            contact_birthdays.print_book(output_format=self.output_format)
+
+    # Filter contacts that have birthday within specified amount of days
+    @input_error
+    def show_birthdays_within(self, commands):
+        contact_birthdays = self.phone_book.show_birthdays_within(commands[1])
+        if not contact_birthdays:
+            print(f"No contacts with birthdays within {commands[1]} days")
+        else:
+            contact_birthdays.print_book(output_format=self.output_format)
     
+    # Show days left to birthdays within specified amount of days (command: upcoming)
+    @input_error
+    def show_upcoming_birthdays(self, commands):
+        upcoming = self.phone_book.upcoming_birthdays(commands[1])
+        if not upcoming:
+            return f"No contacts with birthdays within {commands[1]} days"
+        return "\n".join(f"in {days} days: {name}" for days, name in upcoming)
+
+    # Show amount of birthdays in each week (command: birthdays_per_week)
+    @input_error
+    def show_birthday_histogram(self, commands):
+        histogram = self.phone_book.birthday_histogram(commands[1] if len(commands) > 1 else HISTOGRAM_WEEKS)
+        largest = max(histogram) or 1
+        start = date.today() + timedelta(days=1)
+        lines = []
+        for week, count in enumerate(histogram):
+            first = start + timedelta(weeks=week)
+            last = first + timedelta(days=6)
+            bar = "#" * round(count * HISTOGRAM_WIDTH / largest)
+            lines.append(f"{first:%d.%m}-{last:%d.%m} {count:>7} {bar}")
+        return "\n".join(lines)
+
     # Print all contacts in the data base (command: show all)
     def display(self):
         if not self.phone_book:
             print("No contacts found.")
         else:
-            self.phone_book.print_book()
+            self.phone_book.print_book(output_format=self.output_format)
+
+    # Print page of contacts ordered by name (command: page)
+    @input_error
+    def display_page(self, commands):
+        page = int(commands[1])
+        if page < 1:
+            raise ValueError("Page number starts from 1")
+        if len(self.phone_book) <= (page - 1) * ROWS_PER_PAGE:
+            print(f"No page {page} in contact book.")
+        else:
+            self.phone_book.print_book(page - 1, by_name=True, count=1, output_format=self.output_format)
+
+    # Import contacts from CSV or JSONL file (command: import)
+    @input_error
+    def import_contacts(self, commands):
+        imported, rejected, errors = import_records(self.phone_book, self.file_path(commands[1]))
+        return "\n".join([f"Imported {imported} contacts, rejected {rejected} rows"] + errors)
+
+    # Export contacts to CSV or JSONL file (command: export)
+    @input_error
+    def export_contacts(self, commands):
+        exported = export_records(self.phone_book, self.file_path(commands[1]))
+        return f"Exported {exported} contacts to {commands[1]}"
+
+    # Path of the file of import or export command: any path, or a file inside files_dir
+    # (clients of the server must not read or write other files)
+    def file_path(self, filename):
+        if not self.file_commands:
+            raise ValueError("Import and export are not available")
+        if self.files_dir is None:
+            return filename
+        directory = os.path.realpath(self.files_dir)
+        path = os.path.realpath(os.path.join(directory, filename))
+        if path == directory or os.path.commonpath([directory, path]) != directory:
+            raise ValueError(f"File {filename} is outside of the files directory")
+        return path
 
     # Quit the program ( command: good buy, close, exit)
     def quit_bot(self):
-        self.phone_book.save_address_book()
+        self.save_books()
+        STATS.dump()
         quit()
 
+    # Save books on exit: books loaded by the bot are saved and unloaded, provided book is saved
+    def save_books(self):
+        if self.own_books:
+            self.books.close()
+        elif self.books is None:
+            self.phone_book.save_address_book()
+
+    # Stop using the shared book (end of server session)
+    def release_book(self):
+        if self.books is not None and not self.own_books:
+            self.books.release(self.book_name)
+
+    # Select the named book (command: use)
+    @input_error
+    def use_book(self, commands):
+        if len(commands) < 2:
+            return f"Using address book {self.book_name}" if self.book_name else "Using the provided address book"
+        if self.books is None:
+            raise ValueError("This bot works with one address book")
+        name = commands[1]
+        if name != self.book_name:
+            # The new book is loaded before the current one is released, so the current one is not unloaded
+            # while the command is executed
+            self.phone_book = self.books.acquire(name)
+            self.books.release(self.book_name)
+            self.book_name = name
+        return f"Using address book {name}"
+
+    # Set format of printed contacts (command: format)
+    @input_error
+    def set_output_format(self, commands):
+        output_format = commands[1].lower()
+        if output_format not in RendererFactory.FORMATS:
+            raise ValueError(f"Unknown format {commands[1]}, use one of: {', '.join(RendererFactory.FORMATS)}")
+        self.output_format = output_format
+        return f"Contacts are printed as {output_format}"
+
+    # Show statistics of commands (command: stats)
+    @input_error
+    def show_stats(self, commands):
+        action = commands[1].lower() if len(commands) > 1 else ''
+        if action == 'on':
+            STATS.enable()
+            return "Statistics are enabled"
+        elif action == 'off':
+            STATS.disable()
+            return "Statistics are disabled"
+        elif action == 'reset':
+            STATS.reset()
+            self.phone_book.cache_hits = self.phone_book.cache_misses = 0
+            return "Statistics are reset"
+        elif action:
+            raise ValueError("Use stats, stats on, stats off or stats reset")
+        if not STATS.enabled:
+            return "Statistics are disabled. Use stats on to enable"
+        return (STATS.report() +
+                f"\nQuery cache of the book: {self.phone_book.cache_hits} hits, {self.phone_book.cache_misses} misses")
+
 
     @input_error
     def add_note(self, commands):
@@ -256,46 +534,123 @@ class BotCLI(Command):
             'add': set_contact,
             'change': update_phone,
             'phone' : get_phone,
+            'whois': find_owner,
+            'fuzzy': filter_similar,
+            'upcoming': show_upcoming_birthdays,
+            'birthdays_per_week': show_birthday_histogram,
             'set_birthday' : provide_birthday,
             'set_note' : add_note,
             'update_note' : edit_note,
             'delete_note' : delete_note,
             'update_tag' : update_tag,
             'days_to_birthday': show_birthdays,
+            'birthdays_within': show_birthdays_within,
             'delete' : remove,
             'show all': display,
+            'page': display_page,
             'search': filter_contacts,
+            'search_notes': filter_notes,
+            'search_tag': filter_tag,
+            'import': import_contacts,
+            'export': export_contacts,
             'help': help_info,
+            'stats': show_stats,
+            'format': set_output_format,
+            'use': use_book,
             'exit' : quit_bot
         }
     
     def start_bot(self):
-        exit_cmds = ["good bye", "close", "exit"]
         while True:
-            commands = list()
             prop = input("Enter a command( or 'help' for list of available commands: ")
-            if prop.lower() in exit_cmds:
-                prop = 'exit'
-            commands = prop.split(' ')
-            if len(commands)>0: 
-                commands[0]=commands[0].lower()
-            match commands[0]:
-                case 'exit':
-                    print("Good bye!")
-                    self.get_handler(commands[0])(self)
-                case 'hello' | 'help':
-                    print(self.get_handler(commands[0])(self))                
-                case 'add' | 'change' | 'phone' | 'set_birthday' | 'set_note' | 'update_note' | 'delete_note' | 'update_tag':
-                    print(self.get_handler(commands[0])(self, commands))            
-                case 'show':
-                    show_all = " ".join(commands).lower()
-                    if show_all == 'show all':
-                        self.get_handler(f"{show_all}")(self)
-                    else:
-                        print("Incorrect <show all> command. Please, re-enter.")
-                case 'delete':
-                    print(self.get_handler(commands[0])(self, commands))
-                case 'search' | 'days_to_birthday':
-                    self.get_handler(commands[0])(self, commands)
-                case _:
-                    print("Incorrect command, please provide the command from the list in command prompt") 
\ No newline at end of file
+            self.execute_command(prop)
+
+    # Batch mode: execute commands of a script (one per line, empty lines and lines starting with # are skipped)
+    # until the end or exit command. Output is buffered, changes of the book are persisted together
+    # and the book is saved once at the end. Returns amount of executed commands
+    def run_batch(self, lines, output=None):
+        output = output or sys.stdout
+        buffer = io.StringIO()
+        executed = 0
+        # Changes of the book are kept until the batch ends, so the book is used by the batch until then
+        # and is not unloaded by BookCache when the script selects other books (use command)
+        book_name = self.book_name
+        if self.books is not None:
+            self.books.acquire(book_name)
+        try:
+            with self.phone_book.deferred_changes(), redirect_stdout(buffer):
+                for line in lines:
+                    prop = line.rstrip('\r\n')
+                    if not prop.strip() or prop.startswith('#'):
+                        continue
+                    if prop.lower() in EXIT_COMMANDS:
+                        break
+                    self.execute_command(prop)
+                    executed += 1
+                    if executed % BATCH_FLUSH_EVERY == 0:
+                        output.write(buffer.getvalue())
+                        buffer.seek(0)
+                        buffer.truncate()
+        finally:
+            if self.books is not None:
+                self.books.release(book_name)
+        output.write(buffer.getvalue())
+        output.flush()
+        self.save_books()
+        return executed
+
+    # Parse the command line and execute the command, results are printed.
+    # Commands that change the book lock it for writing, other commands - for reading
+    def execute_command(self, prop):
+        command = self.command_name(prop)
+        lock = self.phone_book.lock
+        guard = lock.write() if command in WRITE_COMMANDS else lock.read()
+        with guard:
+            if not STATS.enabled:
+                self._execute_command(prop)
+                return
+            start = time.perf_counter()
+            try:
+                self._execute_command(prop)
+            finally:
+                STATS.record(command, time.perf_counter() - start)
+
+    # Name of the command (key of COMMANDS) or 'unknown'
+    def command_name(self, prop) -> str:
+        if prop.lower() in EXIT_COMMANDS:
+            return 'exit'
+        command = prop.split(' ')[0].lower()
+        if command == 'show':
+            command = 'show all'
+        return command if command in self.COMMANDS else 'unknown'
+
+    def _execute_command(self, prop):
+        commands = list()
+        if prop.lower() in EXIT_COMMANDS:
+            prop = 'exit'
+        commands = prop.split(' ')
+        if len(commands)>0: 
+            commands[0]=commands[0].lower()
+        match commands[0]:
+            case 'exit':
+                print("Good bye!")
+                self.get_handler(commands[0])(self)
+            case 'hello' | 'help':
+                print(self.get_handler(commands[0])(self))                
+            case 'add' | 'change' | 'phone' | 'whois' | 'set_birthday' | 'set_note' | 'update_note' | 'delete_note' | 'update_tag':
+                print(self.get_handler(commands[0])(self, commands))            
+            case 'show':
+                show_all = " ".join(commands).lower()
+                if show_all == 'show all':
+                    self.get_handler(f"{show_all}")(self)
+                else:
+                    print("Incorrect <show all> command. Please, re-enter.")
+            case 'delete' | 'import' | 'export' | 'stats' | 'format' | 'use' | 'upcoming' | 'birthdays_per_week':
+                print(self.get_handler(commands[0])(self, commands))
+            case 'search' | 'fuzzy' | 'search_notes' | 'search_tag' | 'days_to_birthday' | 'birthdays_within' | 'page':
+                # Results are printed by handlers, only errors are returned
+                error = self.get_handler(commands[0])(self, commands)
+                if error:
+                    print(error)
+            case _:
+                print("Incorrect command, please provide the command from the list in command prompt") 
\ No newline at end of file
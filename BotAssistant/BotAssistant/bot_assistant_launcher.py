@@ -1,10 +1,70 @@
+from address_book import AddressBook, STORAGE_TYPE
+from books import MEMORY_BUDGET, BookCache
 from bot import BotCLI
+from renderer import RendererFactory
+from stats import STATS
+import argparse
+import sys
 
-# Main module
-def main():
-    bot = BotCLI()
-    bot.start_bot()
+# Options of both modes: address book and statistics (see stats command)
+def add_common_arguments(parser):
+    parser.add_argument('--storage', default=STORAGE_TYPE, help="storage type (see FileConnectorFactory)")
+    parser.add_argument('--unique-phones', action='store_true', help="reject phones that belong to another contact")
+    parser.add_argument('--parallel', type=int, default=0, metavar='WORKERS',
+                        help="scan large books by WORKERS processes when search can't use the index")
+    parser.add_argument('--books-memory', type=int, default=MEMORY_BUDGET // 2 ** 20, metavar='MB',
+                        help="estimated memory of loaded books after which unused books are saved and unloaded")
+    parser.add_argument('--stats', action='store_true', help="collect statistics of commands")
+    parser.add_argument('--stats-json', help="write statistics to JSON file on exit (enables statistics)")
+
+def apply_common_arguments(args):
+    AddressBook.parallel_workers = args.parallel
+    AddressBook.unique_phones = args.unique_phones
+    if args.stats or args.stats_json:
+        STATS.enable(args.stats_json)
+
+# Main module (bot_assistant_launcher.py --batch commands.txt executes commands of the file, - is stdin)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Address book bot")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="execute commands of the file (or stdin) without prompts, save once at the end")
+    parser.add_argument('--format', default='text', choices=list(RendererFactory.FORMATS), help="format of printed contacts")
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+    apply_common_arguments(args)
+    if args.batch is None:
+        bot = BotCLI(args.storage, output_format=args.format, memory_budget=args.books_memory * 2 ** 20)
+        bot.start_bot()
+        return
+    bot = BotCLI(args.storage, autosave=False, output_format=args.format, memory_budget=args.books_memory * 2 ** 20)
+    if args.batch == '-':
+        bot.run_batch(sys.stdin)
+    else:
+        with open(args.batch, encoding='utf-8') as file:
+            bot.run_batch(file)
+    STATS.dump()
+
+# Server mode: many clients work with one address book (bot_assistant_launcher.py server --port 8765)
+def server_main(argv=None):
+    # Imported here, so the interactive bot doesn't load asyncio
+    from server import BotServer
+
+    parser = argparse.ArgumentParser(description="Address book bot server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="path of Unix socket (instead of TCP)")
+    parser.add_argument('--files', metavar='DIR', help="directory of files for import and export (not available without it)")
+    add_common_arguments(parser)
+    args = parser.parse_args(argv)
+    apply_common_arguments(args)
+
+    books = BookCache(args.storage, args.books_memory * 2 ** 20)
+    print(f"Serving on {args.unix or f'{args.host}:{args.port}'}")
+    BotServer(books, files_dir=args.files).run(args.host, args.port, args.unix)
 
 if __name__ == '__main__':    
-    main()
+    if sys.argv[1:2] == ['server']:
+        server_main(sys.argv[2:])
+    else:
+        main()
     
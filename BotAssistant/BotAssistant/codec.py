@@ -0,0 +1,134 @@
+from address_book import AddressBook, Birthday, Name, Record
+from array import array
+from itertools import accumulate, chain
+import struct
+import sys
+import zlib
+
+
+# Compact binary format of the book (see CompactFileDBConnector). Unlike pickle it has no class paths
+# and attribute names, so it doesn't depend on the classes of address_book module.
+# Layout (little-endian):
+#   header: magic (8 bytes), schema version (2 bytes), flags (2 bytes), amount of records <count> (8 bytes)
+#   body (compressed by zlib if flag COMPRESSED is set): sections, every section is its length (8 bytes) and data.
+# Fields are stored by columns: strings of a field are one UTF-8 text with lengths (in characters) of the strings
+# in a separate section, so the whole column is decoded at once. Sections of schema version 1:
+#   names: lengths (4 bytes each), text
+#   birthdays: lengths (0 if contact has no birthday), text
+#   phones: amount of phones of every contact (4 bytes each), phone numbers (8 bytes each)
+#   notes: amount of notes of every contact (4 bytes each), notes: lengths, text, tags: lengths, text
+MAGIC = b"BABBOOK\0"
+HEADER = struct.Struct("<8sHHQ")
+SECTION_LENGTH = struct.Struct("<Q")
+SCHEMA_VERSION = 1
+# Flags of the header
+COMPRESSED = 1
+# Level of zlib compression (the fastest, records compress well anyway)
+COMPRESSION_LEVEL = 1
+
+
+def _array_bytes(items: array) -> bytes:
+    if sys.byteorder != "little":
+        items.byteswap()
+    return items.tobytes()
+
+
+def _bytes_array(typecode: str, data: bytes) -> array:
+    items = array(typecode)
+    items.frombytes(data)
+    if sys.byteorder != "little":
+        items.byteswap()
+    return items
+
+
+# Sections of the column of strings: (lengths, text)
+def _encode_strings(strings: list) -> list:
+    return [_array_bytes(array("I", map(len, strings))), "".join(strings).encode("utf-8")]
+
+
+def _decode_strings(lengths: bytes, text: bytes) -> list:
+    text = str(text, "utf-8")
+    ends = list(accumulate(_bytes_array("I", lengths)))
+    return list(map(text.__getitem__, map(slice, chain((0,), ends), ends)))
+
+
+def encode_book(address_book: AddressBook, compress: bool = False) -> bytes:
+    records = address_book.data.values()
+    phone_counts = array("I")
+    phones = array("Q")
+    note_counts = array("I")
+    notes = []
+    tags = []
+    for record in records:
+        phone_counts.append(len(record._phones))
+        phones.extend(record._phones)
+        note_counts.append(len(record.notes))
+        notes.extend(record.notes)
+        tags.extend(record.notes.values())
+    sections = [
+        *_encode_strings(list(address_book.data)),
+        *_encode_strings([record.birthday.value if record.birthday else "" for record in records]),
+        _array_bytes(phone_counts), _array_bytes(phones),
+        _array_bytes(note_counts), *_encode_strings(notes), *_encode_strings(tags),
+    ]
+    body = b"".join(SECTION_LENGTH.pack(len(section)) + section for section in sections)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, COMPRESSION_LEVEL)
+        flags |= COMPRESSED
+    return HEADER.pack(MAGIC, SCHEMA_VERSION, flags, len(address_book.data)) + body
+
+
+# True if data starts as the book in compact format (other files are pickled books)
+def is_encoded(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+
+def decode_book(data: bytes) -> AddressBook:
+    magic, version, flags, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Data is not an address book in compact format")
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"Address book has format version {version}, only versions up to {SCHEMA_VERSION} are supported")
+    body = memoryview(data)[HEADER.size:]
+    if flags & COMPRESSED:
+        body = memoryview(zlib.decompress(body))
+    sections = []
+    position = 0
+    while position < len(body):
+        (length,) = SECTION_LENGTH.unpack_from(body, position)
+        position += SECTION_LENGTH.size
+        sections.append(body[position:position + length])
+        position += length
+    names = _decode_strings(sections[0], sections[1])
+    birthdays = _decode_strings(sections[2], sections[3])
+    phone_counts = _bytes_array("I", sections[4])
+    phones = _bytes_array("Q", sections[5])
+    note_counts = _bytes_array("I", sections[6])
+    notes = _decode_strings(sections[7], sections[8])
+    tags = [sys.intern(tag) for tag in _decode_strings(sections[9], sections[10])]
+
+    # Values were validated when the book was saved, so fields are restored without validation
+    address_book = AddressBook()
+    data = address_book.data
+    phone_start = note_start = 0
+    for index in range(count):
+        record = Record.__new__(Record)
+        name = Name.__new__(Name)
+        name._Field__value = names[index]
+        record.name = name
+        if birthdays[index]:
+            birthday = Birthday.__new__(Birthday)
+            birthday._Field__value = birthdays[index]
+            record.birthday = birthday
+        else:
+            record.birthday = None
+        phone_end = phone_start + phone_counts[index]
+        record._phones = phones[phone_start:phone_end]
+        phone_start = phone_end
+        note_end = note_start + note_counts[index]
+        record.notes = dict(zip(notes[note_start:note_end], tags[note_start:note_end]))
+        note_start = note_end
+        record._book = address_book
+        data[names[index]] = record
+    return address_book
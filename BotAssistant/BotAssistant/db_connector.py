@@ -1,8 +1,90 @@
 from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+import mmap
 import pickle
 import os.path
+import sqlite3
+import struct
+import sys
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+# Lock of the file shared by processes, the lock file is created if needed.
+# Shared locks are taken by appends to the journal, exclusive by saving and loading.
+# Windows has no shared locks (msvcrt), every lock is exclusive there
+@contextmanager
+def file_lock(filename, shared=False):
+    with open(filename, "a+b") as file:
+        if fcntl:
+            fcntl.flock(file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        elif msvcrt:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            elif msvcrt:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Version stamp of the book file (0 if the file has no stamp yet or it's damaged)
+def read_version(filename):
+    try:
+        with open(filename, "r") as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return 0
+
+
+def write_version(filename, version):
+    with open(filename, "w") as file:
+        file.write(str(version))
+
+
+# Contact fields compared by merge: (birthday, phones, notes), None if there is no contact
+def record_state(record):
+    if record is None:
+        return None
+    return (record.birthday.value if record.birthday else None, tuple(record._phones), dict(record.notes))
+
+
+# Contact changed by this process (ours) and by another one (theirs) since the <base> state (see record_state).
+# Changes of both are kept: phones and notes added or removed by this process are applied to theirs,
+# birthday is ours if this process changed it. A contact deleted by one process and changed by another is kept
+def merge_records(name, base, ours, theirs):
+    if ours is None or theirs is None:
+        return ours or theirs
+    # Imported here to avoid circular import (address_book module uses connectors)
+    from address_book import Record
+    base_birthday, base_phones, base_notes = base or (None, (), {})
+    birthday, phones, notes = record_state(ours)
+    merged = Record(name, birthday if birthday != base_birthday else record_state(theirs)[0] or "")
+    removed = set(base_phones).difference(phones)
+    merged._phones = array("Q", [number for number in theirs._phones if number not in removed])
+    merged._phones.extend(number for number in phones if number not in base_phones and number not in merged._phones)
+    merged.notes = {note: tag for note, tag in theirs.notes.items() if note not in base_notes or note in notes}
+    merged.notes.update((note, tag) for note, tag in notes.items() if base_notes.get(note) != tag)
+    return merged
+
 
 class FileConnector(ABC):
+    # True if every change is persisted by log_change (then the book doesn't need autosave)
+    saves_changes = False
+    # File of the default book, other books are stored next to it (see book_filename)
+    FILENAME = None
+
     @abstractmethod
     def save_data(self, connection_string):
         pass
@@ -11,30 +93,705 @@ class FileConnector(ABC):
     def retreive_data(self, connection_string):
         pass
 
+    # Called on every change of the address book (record is None if contact was deleted).
+    # Connectors that persist changes one by one override it, the rest save the whole book on exit
+    def log_change(self, address_book, name, record=None):
+        pass
+
+    # Called before the contact is changed, added (record is the replaced one or None) or deleted
+    def before_change(self, name, record):
+        pass
+
+    # Called when many records are changed at once (e.g. import), changes is list of (name, record)
+    def log_changes(self, address_book, changes):
+        for name, record in changes:
+            self.log_change(address_book, name, record)
+
+    # Saving in two steps (see autosave): snapshot is taken under the read lock of the book and returns
+    # its consistent copy, save_snapshot writes the copy without the lock, so commands are not blocked,
+    # and returns the state of saving that is passed to restore_save_state under the lock.
+    # Connectors that can't copy the book return None (the book is saved by save_data under the lock)
+    def snapshot(self, address_book):
+        return None
+
+    def save_snapshot(self, snapshot, filename=None, own_file=True):
+        return None
+
+    def restore_save_state(self, address_book, state):
+        pass
+
+    # File of the named book: the same directory and extension as FILENAME
+    @classmethod
+    def book_filename(cls, book_name):
+        directory, default_name = os.path.split(cls.FILENAME)
+        return os.path.join(directory, book_name + os.path.splitext(default_name)[1])
+
 
 class BinaryFileDBConnector(FileConnector):
     FILENAME = "./BotAssistant/BotAssistant/res/phone_book.dat"
+    VERSION_SUFFIX = ".version"
+    LOCK_SUFFIX = ".lock"
 
-    def save_data(self, address_book, filename=FILENAME):
-        with open (filename, "wb") as file:
-            pickle.dump(address_book, file)
-    
-    def retreive_data(self, filename=FILENAME):
+    def __init__(self, filename=FILENAME):
+        self.filename = filename
+        # Version stamp of the file the book in memory is based on (0 if the file has no stamp)
+        self.version = 0
+        # False after changes of other processes were merged into the file, the book in memory
+        # doesn't have them, so every following save merges too
+        self.synced = True
+        # Contacts changed since the last save: name -> version of the book when it was changed
+        self.changed = {}
+        # State of changed contacts (see record_state) when they were loaded or saved: name -> state
+        self.base = {}
+        # Version of the book when it was saved last time
+        self.saved_version = 0
+        # Names of contacts that were changed by this process and by another one (see merge)
+        self.conflicts = []
+
+    # Several processes can use the same book: the file is written under exclusive lock (see file_lock)
+    # and every save increments the version stamp. If the stamp on disk is not the one the book is based on,
+    # another process has saved the book meanwhile, so only the contacts changed by this process
+    # are applied to the records of the file (see merge)
+    def save_data(self, address_book, filename=None):
+        filename = filename or self.filename
+        own_file = address_book._connector is self and filename == self.filename
+        state = self.save_snapshot(self.snapshot(address_book), filename, own_file)
+        if own_file:
+            self.restore_save_state(address_book, state)
+
+    # (content of the file, changed contacts, their base states, version of the book,
+    # states of the changed contacts in the snapshot)
+    def snapshot(self, address_book):
+        states = {name: record_state(address_book.data.get(name)) for name in self.changed}
+        return (self.encode(address_book), dict(self.changed), dict(self.base), address_book.version, states)
+
+    # Returns (version stamp, synced, version of the saved book, conflicts, states of the saved contacts),
+    # see restore_save_state. <own_file> is False if the book is copied to another file (nothing to merge)
+    def save_snapshot(self, snapshot, filename=None, own_file=True):
+        filename = filename or self.filename
+        data, changed, base, saved_version, states = snapshot
+        synced = self.synced
+        conflicts = []
+        with file_lock(filename + self.LOCK_SUFFIX):
+            disk_version = read_version(filename + self.VERSION_SUFFIX)
+            if own_file and not self.is_current(filename, disk_version):
+                merged, conflicts = self.merge(self.decode(data), changed, base, filename)
+                data = self.encode(merged)
+                synced = False
+            self.write(data, filename)
+            write_version(filename + self.VERSION_SUFFIX, disk_version + 1)
+            self.saved(filename)
+        return (disk_version + 1, synced, saved_version, self.conflicts + conflicts, states)
+
+    # True if the file has nothing that the book in memory doesn't have
+    def is_current(self, filename, disk_version):
+        return self.synced and disk_version == self.version
+
+    # Called after the file is written (under the lock)
+    def saved(self, filename):
+        pass
+
+    def encode(self, address_book):
+        return pickle.dumps(address_book)
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+    def write(self, data, filename):
+        # The file is written to temporary file first and replaced at once,
+        # so a crash during saving keeps the previous file (name is unique for process)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open (tmp_filename, "wb") as file:
+            file.write(data)
+        os.replace(tmp_filename, filename)
+
+    # Book of the file with the contacts changed by this process and names of contacts that were changed
+    # by another process too (compared with the state the changes are based on). Such contacts are merged
+    # by fields (see merge_records), so changes of both processes are kept, and reported
+    def merge(self, address_book, changed, base, filename):
+        merged = self.read(filename)
+        if merged is None:
+            # Imported here to avoid circular import (address_book module uses connectors)
+            from address_book import AddressBook
+            merged = AddressBook()
+        conflicts = []
+        for name in changed:
+            record = address_book.data.get(name)
+            theirs = merged.data.get(name)
+            if record_state(theirs) not in (base.get(name), record_state(record)):
+                conflicts.append(name)
+                record = merge_records(name, base.get(name), record, theirs)
+            if record is None:
+                merged.data.pop(name, None)
+            else:
+                merged.data[name] = record
+        if conflicts:
+            print(f"Contacts {', '.join(conflicts)} were changed by another process too, changes were merged", file=sys.stderr)
+        return merged, conflicts
+
+    # Changes saved with the book are not tracked anymore. Contacts changed after the snapshot
+    # (see autosave) are based on their state in the saved snapshot
+    def restore_save_state(self, address_book, state):
+        self.version, self.synced, self.saved_version, self.conflicts, states = state
+        self.changed = {name: version for name, version in self.changed.items() if version > self.saved_version}
+        self.base = {name: states.get(name, base) for name, base in self.base.items() if name in self.changed}
+
+    # The state of the contact before the first change since the last save
+    def before_change(self, name, record):
+        if name not in self.base:
+            self.base[name] = record_state(record)
+
+    def log_change(self, address_book, name, record=None):
+        self.changed[name] = address_book.version
+
+    def retreive_data(self, filename=None):
+        filename = filename or self.filename
+        with file_lock(filename + self.LOCK_SUFFIX):
+            if filename == self.filename:
+                self.version = read_version(filename + self.VERSION_SUFFIX)
+                self.synced = True
+                self.changed = {}
+                self.base = {}
+            return self.read(filename)
+
+    def read(self, filename):
         if os.path.isfile(filename):
             with open(filename, 'rb') as file:            
-                content = pickle.load(file)
+                content = self.decode(file.read())
             return content
         else:
             return None
         
+
+# Snapshot of the book is stored the same way as in BinaryFileDBConnector,
+# every change since the snapshot is appended to the journal file, so saving a change costs O(change).
+# Processes that share the book append to the same journal (under shared lock, so compaction waits for them).
+# Entry is (name, record or None if deleted, state of the contact the change is based on), a contact changed
+# by another process since that state is merged by fields on replay (see merge_records)
+class JournalFileDBConnector(BinaryFileDBConnector):
+    saves_changes = True
+    JOURNAL_SUFFIX = ".journal"
+    # Minimal amount of journal entries after which the journal is compacted into a new snapshot
+    COMPACT_EVERY = 1000
+
+    def __init__(self, filename=BinaryFileDBConnector.FILENAME, compact_every=COMPACT_EVERY):
+        super().__init__(filename)
+        self.compact_every = compact_every
+        # Amount of entries in the journal
+        self.entries = 0
+        # Size of the journal if only this process appended to it since the book was read
+        self.journal_size = 0
+
+    def journal_filename(self, filename=None):
+        return (filename or self.filename) + self.JOURNAL_SUFFIX
+
+    # Entries appended by other processes are in the journal, but not in the book in memory
+    def is_current(self, filename, disk_version):
+        journal_filename = self.journal_filename(filename)
+        size = os.path.getsize(journal_filename) if os.path.isfile(journal_filename) else 0
+        return super().is_current(filename, disk_version) and size == self.journal_size
+
+    # Snapshot is written, drop the journal (compaction).
+    # A crash before the journal is removed keeps the journal, its entries are applied to the snapshot again
+    def saved(self, filename):
+        journal_filename = self.journal_filename(filename)
+        if os.path.isfile(journal_filename):
+            os.remove(journal_filename)
+        self.entries = 0
+        self.journal_size = 0
+
+    # Load snapshot and replay the journal on top of it
+    def read(self, filename):
+        address_book = super().read(filename)
+        self.entries = 0
+        self.journal_size = 0
+        journal_filename = self.journal_filename(filename)
+        if not os.path.isfile(journal_filename):
+            return address_book
+        if address_book is None:
+            # Imported here to avoid circular import (address_book module uses connectors)
+            from address_book import AddressBook
+            address_book = AddressBook()
+        with open(journal_filename, "r+b") as file:
+            while True:
+                position = file.tell()
+                try:
+                    name, record, *base = pickle.load(file)
+                except (EOFError, pickle.UnpicklingError):
+                    # End of journal. If the last entry was written partially (crash),
+                    # it is dropped so new entries can be appended (appends wait for the lock of retreive_data)
+                    file.truncate(position)
+                    break
+                # Entries of older versions have no base state
+                if base:
+                    theirs = address_book.data.get(name)
+                    if record_state(theirs) not in (base[0], record_state(record)):
+                        record = merge_records(name, base[0], record, theirs)
+                if record is None:
+                    address_book.delete(name)
+                else:
+                    # Entries restore the state that was already accepted (e.g. phones shared by imported contacts),
+                    # so they are added without validation
+                    address_book.add_records([record])
+                self.entries += 1
+            self.journal_size = position
+        return address_book
+
+    # Journal is compacted when it has more entries than the book has records (but not less than compact_every),
+    # so the cost of compaction per change doesn't grow with the size of the book
+    def needs_compaction(self, address_book):
+        return self.entries >= max(self.compact_every, len(address_book.data))
+
+    def log_change(self, address_book, name, record=None):
+        self.log_changes(address_book, [(name, record)])
+
+    # The next change of the contact is based on the logged state
+    def log_changes(self, address_book, changes):
+        entries = b"".join(pickle.dumps((name, record, self.base.get(name))) for name, record in changes)
+        with file_lock(self.filename + self.LOCK_SUFFIX, shared=True):
+            with open(self.journal_filename(), "ab") as file:
+                file.write(entries)
+        self.journal_size += len(entries)
+        self.entries += len(changes)
+        self.changed.update((name, address_book.version) for name, _ in changes)
+        self.base.update((name, record_state(record)) for name, record in changes)
+        if self.needs_compaction(address_book):
+            self.save_data(address_book)
+
+
+# Book is stored in compact binary format (see codec module) instead of pickle, with locking and
+# version stamps of BinaryFileDBConnector. The book stored by BinaryFileDBConnector (file with the same name
+# and extension .dat) is read once, when the file of this connector doesn't exist yet, and saved in the new format
+class CompactFileDBConnector(BinaryFileDBConnector):
+    FILENAME = "./BotAssistant/BotAssistant/res/phone_book.bab"
+    PICKLE_EXTENSION = ".dat"
+
+    def __init__(self, filename=FILENAME, compress=False):
+        super().__init__(filename)
+        self.compress = compress
+
+    def encode(self, address_book):
+        # Imported here to avoid circular import (codec uses address_book module)
+        from codec import encode_book
+        return encode_book(address_book, self.compress)
+
+    # Pickled books are read too (see migrate)
+    def decode(self, data):
+        from codec import decode_book, is_encoded
+        if not is_encoded(data):
+            return pickle.loads(data)
+        return decode_book(data)
+
+    def read(self, filename):
+        if not os.path.isfile(filename):
+            return self.migrate(filename)
+        return super().read(filename)
+
+    # Book of the pickle file (written in the new format) or None if there is no such file
+    def migrate(self, filename):
+        pickle_filename = os.path.splitext(filename)[0] + self.PICKLE_EXTENSION
+        address_book = super().read(pickle_filename)
+        if address_book is not None:
+            self.write(self.encode(address_book), filename)
+        return address_book
+
+
+# Contacts are stored in SQLite data base, records are read on demand (see SQLiteAddressBook)
+class SQLiteDBConnector(FileConnector):
+    saves_changes = True
+    FILENAME = "./BotAssistant/BotAssistant/res/phone_book.db"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            name TEXT PRIMARY KEY,
+            name_lower TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS phones (
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            phone TEXT NOT NULL,
+            PRIMARY KEY (name, position)
+        );
+        CREATE INDEX IF NOT EXISTS phones_phone ON phones (phone);
+        CREATE TABLE IF NOT EXISTS birthdays (
+            name TEXT PRIMARY KEY,
+            birthday TEXT NOT NULL,
+            month INTEGER NOT NULL,
+            day INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS birthdays_month_day ON birthdays (month, day);
+        CREATE TABLE IF NOT EXISTS notes (
+            name TEXT NOT NULL,
+            note TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (name, note)
+        );
+        CREATE INDEX IF NOT EXISTS notes_tag ON notes (tag COLLATE NOCASE);
+    """
+
+    # Substrings of names, phones and notes are found by full text indexes of trigrams (SQLite 3.34+ with FTS5),
+    # the indexes are kept up to date by triggers
+    SEARCH_TABLES = {"records": "name_lower", "phones": "phone", "notes": "note"}
+    SEARCH_SCHEMA = "".join(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table}_search USING fts5(
+            {column}, content='{table}', content_rowid='rowid', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_search (rowid, {column}) VALUES (new.rowid, new.{column});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_search ({table}_search, rowid, {column}) VALUES ('delete', old.rowid, old.{column});
+        END;
+    """ for table, column in SEARCH_TABLES.items())
+    # Shorter text has no trigrams, it's searched by scan of the table
+    MIN_SEARCH_LENGTH = 3
+
+    def __init__(self, filename=FILENAME):
+        self.filename = filename
+        self.connection = None
+        # True inside transaction(), changes are committed when it ends
+        self.deferred = False
+        # True if the data base has the indexes of SEARCH_SCHEMA
+        self.full_text = False
+
+    def connect(self):
+        if self.connection is None:
+            # Connection is shared by threads of server sessions (SQLite serializes the access)
+            self.connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self.connection.executescript(self.SCHEMA)
+            # Unicode aware lower() (built-in lower of SQLite changes only ASCII letters)
+            self.connection.create_function("py_lower", 1, str.lower, deterministic=True)
+            self.full_text = self.create_search_indexes()
+        return self.connection
+
+    # Create the full text indexes (the data base written before they were added is indexed once).
+    # Returns False if SQLite doesn't support them, searches scan the tables then
+    def create_search_indexes(self) -> bool:
+        if sqlite3.sqlite_version_info < (3, 34, 0):
+            return False
+        exists = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'records_search'").fetchone() is not None
+        try:
+            with self.connection:
+                self.connection.executescript(self.SEARCH_SCHEMA)
+                if not exists:
+                    for table in self.SEARCH_TABLES:
+                        self.connection.execute(f"INSERT INTO {table}_search ({table}_search) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            # SQLite is built without FTS5
+            return False
+        return True
+
+    # Query of full text index that matches rows containing the text, or None if the index can't be used
+    def search_query(self, text):
+        if not self.full_text or len(text) < self.MIN_SEARCH_LENGTH:
+            return None
+        return '"' + text.replace('"', '""') + '"'
+
+    # Write the whole book (e.g. migration from binary file). The book recovered
+    # by this connector is already written change by change, so only commit is needed
+    def save_data(self, address_book, filename=None):
+        if filename and filename != self.filename:
+            return SQLiteDBConnector(filename).save_data(address_book)
+        connection = self.connect()
+        if address_book._connector is not self:
+            with connection:
+                for table in ("records", "phones", "birthdays", "notes"):
+                    connection.execute(f"DELETE FROM {table}")
+                for name, record in address_book.data.items():
+                    self.write_record(name, record)
+        connection.commit()
+
+    def retreive_data(self, filename=None):
+        if filename and filename != self.filename:
+            return SQLiteDBConnector(filename).retreive_data()
+        # Imported here to avoid circular import (address_book module uses connectors)
+        from address_book import SQLiteAddressBook
+        self.connect()
+        return SQLiteAddressBook(self)
+
+    # Changes logged inside the block are committed together (one transaction)
+    @contextmanager
+    def transaction(self):
+        connection = self.connect()
+        self.deferred = True
+        try:
+            with connection:
+                yield
+        finally:
+            self.deferred = False
+
+    # Commits the changes unless transaction() is in progress
+    def changes(self):
+        return nullcontext() if self.deferred else self.connect()
+
+    def log_change(self, address_book, name, record=None):
+        with self.changes():
+            if record is None:
+                self.delete_record(name)
+            else:
+                self.write_record(name, record)
+
+    def log_changes(self, address_book, changes):
+        with self.changes():
+            for name, record in changes:
+                if record is None:
+                    self.delete_record(name)
+                else:
+                    self.write_record(name, record)
+
+    # The row of the contact is kept (its rowid is the order of adding, see names), other tables are written again
+    def write_record(self, name, record):
+        self.connection.execute("INSERT INTO records (name, name_lower) VALUES (?, ?) ON CONFLICT (name) DO NOTHING",
+                                (name, name.lower()))
+        for table in ("phones", "birthdays", "notes"):
+            self.connection.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+        self.connection.executemany(
+            "INSERT INTO phones (name, position, phone) VALUES (?, ?, ?)",
+            ((name, position, phone) for position, phone in enumerate(record.phone_numbers())))
+        if record.birthday:
+            birthday_date = record.birthday.to_date()
+            self.connection.execute(
+                "INSERT INTO birthdays (name, birthday, month, day) VALUES (?, ?, ?, ?)",
+                (name, record.birthday.value, birthday_date.month, birthday_date.day))
+        self.connection.executemany(
+            "INSERT INTO notes (name, note, tag) VALUES (?, ?, ?)",
+            ((name, note, tag) for note, tag in record.notes.items()))
+
+    def delete_record(self, name):
+        for table in ("records", "phones", "birthdays", "notes"):
+            self.connection.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+
+    # Returns (birthday, phones, notes) of the contact or None if contact is not present
+    def read_record(self, name):
+        connection = self.connect()
+        if connection.execute("SELECT 1 FROM records WHERE name = ?", (name,)).fetchone() is None:
+            return None
+        birthday = connection.execute("SELECT birthday FROM birthdays WHERE name = ?", (name,)).fetchone()
+        phones = connection.execute("SELECT phone FROM phones WHERE name = ? ORDER BY position", (name,))
+        notes = connection.execute("SELECT note, tag FROM notes WHERE name = ?", (name,))
+        return (birthday[0] if birthday else None, [row[0] for row in phones], dict(notes.fetchall()))
+
+    def contains(self, name):
+        return self.connect().execute("SELECT 1 FROM records WHERE name = ?", (name,)).fetchone() is not None
+
+    def count(self):
+        return self.connect().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    # Names of contacts in order of adding (or by name) starting from position <offset>
+    def names(self, by_name=False, offset=0):
+        order = "name" if by_name else "rowid"
+        rows = self.connect().execute(f"SELECT name FROM records ORDER BY {order} LIMIT -1 OFFSET ?", (offset,))
+        for row in rows:
+            yield row[0]
+
+    # Names of contacts that contain text in name (case insensitive) or in one of the phones
+    def search_names(self, text):
+        connection = self.connect()
+        name_query, phone_query = self.search_query(text.lower()), self.search_query(text)
+        if name_query is None or phone_query is None:
+            rows = connection.execute(
+                "SELECT name FROM records WHERE instr(name_lower, ?) > 0 "
+                "UNION SELECT name FROM phones WHERE instr(phone, ?) > 0",
+                (text.lower(), text))
+        else:
+            rows = connection.execute(
+                "SELECT name FROM records WHERE rowid IN (SELECT rowid FROM records_search WHERE records_search MATCH ?) "
+                "UNION SELECT name FROM phones WHERE rowid IN (SELECT rowid FROM phones_search WHERE phones_search MATCH ?)",
+                (name_query, phone_query))
+        return [row[0] for row in rows]
+
+    # Notes ({name: {note: tag}}) that contain any of the words (case insensitive)
+    def notes_with_words(self, words):
+        notes = {}
+        if not words:
+            return notes
+        connection = self.connect()
+        conditions = []
+        parameters = []
+        queries = []
+        for word in words:
+            query = self.search_query(word)
+            if query is None:
+                conditions.append("instr(py_lower(note), ?) > 0")
+                parameters.append(word)
+            else:
+                queries.append(query)
+        if queries:
+            conditions.append("rowid IN (SELECT rowid FROM notes_search WHERE notes_search MATCH ?)")
+            parameters.append(" OR ".join(queries))
+        condition = " OR ".join(conditions)
+        for name, note, tag in connection.execute(f"SELECT name, note, tag FROM notes WHERE {condition}", parameters):
+            notes.setdefault(name, {})[note] = tag
+        return notes
+
+    # Names of contacts that have notes with the tag, contacts with more such notes first
+    def tag_names(self, tag):
+        rows = self.connect().execute(
+            "SELECT name FROM notes WHERE tag = ? COLLATE NOCASE GROUP BY name ORDER BY COUNT(*) DESC, name", (tag,))
+        return [row[0] for row in rows]
+
+    def phone_names(self, phone):
+        rows = self.connect().execute("SELECT DISTINCT name FROM phones WHERE phone = ? ORDER BY name", (phone,))
+        return [row[0] for row in rows]
+
+    # Amount of birthdays on every day: {(month, day): count}
+    def birthday_counts(self):
+        rows = self.connect().execute("SELECT month, day, COUNT(*) FROM birthdays GROUP BY month, day")
+        return {(month, day): count for month, day, count in rows}
+
+    def birthday_names(self, month, day):
+        rows = self.connect().execute("SELECT name FROM birthdays WHERE month = ? AND day = ?", (month, day))
+        return [row[0] for row in rows]
+
+
+# Read-only view of the file written by MmapFileDBConnector. The file is mapped to memory,
+# so opening it costs the same for any size of the book and a record is decoded only when it's read.
+# Layout (little-endian):
+#   header: magic (8 bytes), amount of records <count> (8 bytes)
+#   offsets: <count> + 1 offsets of records sorted by name (8 bytes each, from the start of records)
+#   order: <count> positions in sorted order of records in order of adding (8 bytes each)
+#   records: length of name (4 bytes), name (UTF-8), pickled Record
+class MmapRecordFile:
+    MAGIC = b"BABMMAP1"
+    HEADER = struct.Struct("<8sQ")
+    OFFSET = struct.Struct("<Q")
+    NAME_LENGTH = struct.Struct("<I")
+
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = self.HEADER.unpack_from(self.map)
+        if magic != self.MAGIC:
+            self.map.close()
+            raise ValueError(f"File {filename} is not a memory mapped address book")
+        self.offsets_start = self.HEADER.size
+        self.order_start = self.offsets_start + self.OFFSET.size * (self.count + 1)
+        self.records_start = self.order_start + self.OFFSET.size * self.count
+
+    def _offset(self, position):
+        return self.records_start + self.OFFSET.unpack_from(self.map, self.offsets_start + self.OFFSET.size * position)[0]
+
+    # Name of the record at <position> of sorted order
+    def name(self, position):
+        start = self._offset(position)
+        (length,) = self.NAME_LENGTH.unpack_from(self.map, start)
+        start += self.NAME_LENGTH.size
+        return str(self.map[start:start + length], "utf-8")
+
+    # Pickled record at <position> of sorted order
+    def payload(self, position):
+        start = self._offset(position)
+        (length,) = self.NAME_LENGTH.unpack_from(self.map, start)
+        return self.map[start + self.NAME_LENGTH.size + length:self._offset(position + 1)]
+
+    def record(self, position):
+        return pickle.loads(self.payload(position))
+
+    # Position of the record with the name (binary search by name) or None
+    def find(self, name):
+        position = bisect_left(range(self.count), name, key=self.name)
+        if position < self.count and self.name(position) == name:
+            return position
+        return None
+
+    # Names sorted, starting from <position>
+    def names(self, position=0):
+        for position in range(position, self.count):
+            yield self.name(position)
+
+    # Names in order of adding
+    def names_in_order(self):
+        for index in range(self.count):
+            yield self.name(self.OFFSET.unpack_from(self.map, self.order_start + self.OFFSET.size * index)[0])
+
+    def close(self):
+        self.map.close()
+
+
+# Contacts are stored in file with sorted index of names that is mapped to memory (see MmapRecordFile),
+# records are decoded on demand (see MmapAddressBook). Changes are kept in memory until the book is saved
+class MmapFileDBConnector(FileConnector):
+    FILENAME = "./BotAssistant/BotAssistant/res/phone_book.mmap"
+
+    def __init__(self, filename=FILENAME):
+        self.filename = filename
+
+    # Opened file or None if it doesn't exist yet
+    def open_file(self):
+        if not os.path.isfile(self.filename):
+            return None
+        return MmapRecordFile(self.filename)
+
+    # Write the whole book to temporary file and replace the file at once (as BinaryFileDBConnector).
+    # Records that were not read from the mapped file are copied without decoding
+    def save_data(self, address_book, filename=None):
+        filename = filename or self.filename
+        data = address_book.data
+        if hasattr(data, "payload_reader"):
+            payload = data.payload_reader()
+        else:
+            payload = lambda name: pickle.dumps(data[name], pickle.HIGHEST_PROTOCOL)
+        names = list(data)
+        sorted_names = sorted(names)
+        positions = {name: position for position, name in enumerate(sorted_names)}
+        count = len(names)
+        records_start = MmapRecordFile.HEADER.size + MmapRecordFile.OFFSET.size * (2 * count + 1)
+        offsets = array("Q")
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "wb") as file:
+            file.seek(records_start)
+            offset = 0
+            for name in sorted_names:
+                offsets.append(offset)
+                encoded_name = name.encode("utf-8")
+                record = payload(name)
+                file.write(MmapRecordFile.NAME_LENGTH.pack(len(encoded_name)))
+                file.write(encoded_name)
+                file.write(record)
+                offset += MmapRecordFile.NAME_LENGTH.size + len(encoded_name) + len(record)
+            offsets.append(offset)
+            order = array("Q", (positions[name] for name in names))
+            if sys.byteorder != "little":
+                offsets.byteswap()
+                order.byteswap()
+            file.seek(0)
+            file.write(MmapRecordFile.HEADER.pack(MmapRecordFile.MAGIC, count))
+            file.write(offsets.tobytes())
+            file.write(order.tobytes())
+        # Windows doesn't allow replacing the file while it's mapped (PermissionError), the book is saved on POSIX only
+        os.replace(tmp_filename, filename)
+        if address_book._connector is self and filename == self.filename:
+            data.reopen()
+
+    def retreive_data(self, filename=None):
+        if filename and filename != self.filename:
+            return MmapFileDBConnector(filename).retreive_data()
+        # Imported here to avoid circular import (address_book module uses connectors)
+        from address_book import MmapAddressBook
+        return MmapAddressBook(self)
+
+
 # Can be extended in case other file storage types usage
 class FileConnectorFactory:
     
-    def get_connector(self, file_storage_type):
+    # Connector of the default book or of the named book (see FileConnector.book_filename)
+    def get_connector(self, file_storage_type, book_name=None):
         if file_storage_type == 'binary':
-            return BinaryFileDBConnector()
+            connector_type = BinaryFileDBConnector
+        elif file_storage_type == 'compact':
+            connector_type = CompactFileDBConnector
+        elif file_storage_type == 'journal':
+            connector_type = JournalFileDBConnector
+        elif file_storage_type == 'sqlite':
+            connector_type = SQLiteDBConnector
+        elif file_storage_type == 'mmap':
+            connector_type = MmapFileDBConnector
         else:
             raise ValueError(f"Unsupported connector type")
+        if book_name is None:
+            return connector_type()
+        return connector_type(connector_type.book_filename(book_name))
         
 
 
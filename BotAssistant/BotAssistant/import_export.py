@@ -0,0 +1,108 @@
+from address_book import AddressBook, Record
+from itertools import islice
+import csv
+import json
+
+
+# Amount of rows validated and added to the book at once
+BATCH_SIZE = 10000
+# Amount of rejected rows that are reported with the reason
+MAX_REPORTED_ERRORS = 10
+# Columns of CSV file (phones are separated with ';', notes are JSON object {note: tag})
+CSV_FIELDS = ['name', 'phones', 'birthday', 'notes']
+
+
+def is_csv(filename: str) -> bool:
+    return filename.lower().endswith('.csv')
+
+
+# Read rows of CSV (dict) or JSONL (line) file one by one: (line number, row)
+def read_rows(filename: str):
+    with open(filename, newline='', encoding='utf-8') as file:
+        if is_csv(filename):
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(file, 1):
+                if line.strip():
+                    yield line_number, line
+
+
+# Convert row of the file to dict with the same fields as in JSONL
+def parse_row(row) -> dict:
+    if isinstance(row, str):
+        return json.loads(row)
+    phones = row.get('phones') or ''
+    row['phones'] = [phone for phone in phones.split(';') if phone]
+    row['notes'] = json.loads(row['notes']) if row.get('notes') else {}
+    return row
+
+
+def row_to_record(row: dict) -> Record:
+    record = Record(row['name'], row.get('birthday') or "")
+    for phone in row.get('phones') or []:
+        record.add_phone(phone)
+    for note, tag in (row.get('notes') or {}).items():
+        record.add_note(note, tag or "")
+    return record
+
+
+def record_to_row(record: Record) -> dict:
+    return {
+        'name': record.name.value,
+        'phones': record.phone_numbers(),
+        'birthday': record.birthday.value if record.birthday else '',
+        'notes': dict(record.notes),
+    }
+
+
+def batches(items, size: int):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+# Import contacts from CSV or JSONL file. Existing contacts with the same name are replaced.
+# Returns amount of imported contacts, amount of rejected rows and descriptions of the first rejected rows
+def import_records(book: AddressBook, filename: str, batch_size: int = BATCH_SIZE):
+    imported = 0
+    rejected = 0
+    errors = []
+    for batch in batches(read_rows(filename), batch_size):
+        records = []
+        for line_number, row in batch:
+            try:
+                records.append(row_to_record(parse_row(row)))
+            except KeyError as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"line {line_number}: field {e} is missing")
+            except (ValueError, TypeError, AttributeError) as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"line {line_number}: {e}")
+        book.add_records(records)
+        imported += len(records)
+    return imported, rejected, errors
+
+
+# Export all contacts to CSV or JSONL file, returns amount of exported contacts
+def export_records(book: AddressBook, filename: str) -> int:
+    exported = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        if is_csv(filename):
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for record in book.data.values():
+                row = record_to_row(record)
+                row['phones'] = ';'.join(row['phones'])
+                row['notes'] = json.dumps(row['notes'], ensure_ascii=False) if row['notes'] else ''
+                writer.writerow(row)
+                exported += 1
+        else:
+            for record in book.data.values():
+                file.write(json.dumps(record_to_row(record), ensure_ascii=False))
+                file.write('\n')
+                exported += 1
+    return exported
@@ -0,0 +1,429 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from collections import Counter
+import heapq
+from datetime import date, timedelta
+import math
+import re
+
+
+# Index over the records of AddressBook. Indexes are built on first use
+# and then kept up to date by the address book on every change of its records
+class RecordIndex(ABC):
+    # True if the index uses names only, then the records are not read to build it (see AddressBook._index)
+    names_only = False
+
+    @abstractmethod
+    def add(self, name, record):
+        pass
+
+    @abstractmethod
+    def remove(self, name):
+        pass
+
+    # Re-index changed record
+    def update(self, name, record):
+        self.remove(name)
+        self.add(name, record)
+
+    # Index all records of the book
+    def build(self, records):
+        for name, record in records:
+            self.add(name, record)
+
+
+# Split text to overlapping substrings of length n ("abcd" -> "abc", "bcd")
+def ngrams(text: str, n=3) -> set:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+# Trigram index over lowercased contact names and phone numbers.
+# Any substring of 3+ characters can be found only in records that contain all of its trigrams
+class SearchIndex(RecordIndex):
+    # Minimal length of text that can be searched with the index
+    MIN_LENGTH = 3
+
+    def __init__(self):
+        # trigram -> names of records
+        self.postings = {}
+        # name -> indexed texts of the record (to find out trigrams to remove on change)
+        self.texts = {}
+        # name -> number of the record in order of adding (as the book keeps records), see search
+        self.order = {}
+        self.added = 0
+
+    @staticmethod
+    def record_texts(name, record):
+        return (name.lower(),) + tuple(record.phone_numbers())
+
+    @staticmethod
+    def texts_ngrams(texts):
+        grams = set()
+        for text in texts:
+            grams |= ngrams(text, SearchIndex.MIN_LENGTH)
+        return grams
+
+    def add(self, name, record):
+        if name in self.texts:
+            return self.update(name, record)
+        texts = self.record_texts(name, record)
+        self.texts[name] = texts
+        self.order[name] = self.added
+        self.added += 1
+        self._link(name, self.texts_ngrams(texts))
+
+    def remove(self, name):
+        self.order.pop(name, None)
+        texts = self.texts.pop(name, None)
+        if texts:
+            self._unlink(name, self.texts_ngrams(texts))
+
+    def update(self, name, record):
+        old_texts = self.texts.get(name)
+        if old_texts is None:
+            return self.add(name, record)
+        texts = self.record_texts(name, record)
+        if texts == old_texts:
+            return
+        grams = self.texts_ngrams(texts)
+        old_grams = self.texts_ngrams(old_texts)
+        self._unlink(name, old_grams - grams)
+        self._link(name, grams - old_grams)
+        self.texts[name] = texts
+
+    def _link(self, name, grams):
+        postings = self.postings
+        for gram in grams:
+            names = postings.get(gram)
+            if names is None:
+                postings[gram] = {name}
+            else:
+                names.add(name)
+
+    def _unlink(self, name, grams):
+        for gram in grams:
+            names = self.postings.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.postings[gram]
+
+    # Names of records that may contain the text (must be verified by caller) in order of adding,
+    # so results don't depend on the way they are found. None if text is too short to use the index
+    def search(self, text: str):
+        grams = ngrams(text.lower(), self.MIN_LENGTH)
+        if not grams:
+            return None
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        return sorted(postings[0].intersection(*postings[1:]), key=self.order.__getitem__)
+
+
+# Phone number -> name of the contact that has it. Numbers that belong to several contacts
+# keep list of names, so the index doesn't need a set for every number
+class PhoneIndex(RecordIndex):
+    def __init__(self):
+        self.owners = {}
+        # name -> phone numbers of the record (to find out numbers to remove on change)
+        self.phones = {}
+
+    def add(self, name, record):
+        if name in self.phones:
+            return self.update(name, record)
+        phones = tuple(record.phone_numbers())
+        self.phones[name] = phones
+        for phone in phones:
+            self._link(name, phone)
+
+    def remove(self, name):
+        for phone in self.phones.pop(name, ()):
+            self._unlink(name, phone)
+
+    def update(self, name, record):
+        phones = tuple(record.phone_numbers())
+        if phones != self.phones.get(name):
+            self.remove(name)
+            self.add(name, record)
+
+    def _link(self, name, phone):
+        owner = self.owners.get(phone)
+        if owner is None:
+            self.owners[phone] = name
+        elif isinstance(owner, list):
+            if name not in owner:
+                owner.append(name)
+        elif owner != name:
+            self.owners[phone] = [owner, name]
+
+    def _unlink(self, name, phone):
+        owner = self.owners.get(phone)
+        if owner == name:
+            del self.owners[phone]
+        elif isinstance(owner, list) and name in owner:
+            owner.remove(name)
+            if len(owner) == 1:
+                self.owners[phone] = owner[0]
+
+    # Names of contacts that have the phone number
+    def search(self, phone: str) -> list:
+        owner = self.owners.get(phone)
+        if owner is None:
+            return []
+        return list(owner) if isinstance(owner, list) else [owner]
+
+
+# Day of year (0..365) of the birthday in leap year calendar, so 29 February has its own bucket
+def day_of_year(month: int, day: int) -> int:
+    return date(2000, month, day).timetuple().tm_yday - 1
+
+
+# (month, day) of birthdays celebrated from <first> to <last> days after today, in order of dates.
+# In non leap years 29 February birthdays are celebrated on 1 March
+def birthday_keys(first: int, last: int, today: date = None):
+    today = today or date.today()
+    # Every birthday is celebrated within 366 days, the same (month, day) can be met twice
+    # in this period, but only the first date is the next birthday
+    seen = set()
+    for days in range(1, min(last, 366) + 1):
+        current = today + timedelta(days=days)
+        keys = [(current.month, current.day)]
+        if current.month == 3 and current.day == 1 and not is_leap_year(current.year):
+            keys.insert(0, (2, 29))
+        for key in keys:
+            if key not in seen:
+                seen.add(key)
+                if days >= first:
+                    yield days, key
+
+
+# Amount of birthdays in each of <weeks> weeks after today (the first week starts tomorrow).
+# count(month, day) gives amount of birthdays on the day, so the cost doesn't depend on amount of contacts
+def birthday_histogram(weeks: int, count, today: date = None) -> list:
+    histogram = [0] * weeks
+    for days, (month, day) in birthday_keys(1, weeks * 7, today):
+        histogram[(days - 1) // 7] += count(month, day)
+    return histogram
+
+
+def is_leap_year(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+# Records grouped in 366 buckets by day of year of the birthday
+class BirthdayIndex(RecordIndex):
+
+    def __init__(self):
+        self.buckets = [set() for _ in range(366)]
+        # name -> bucket of the record
+        self.days = {}
+
+    def add(self, name, record):
+        self.remove(name)
+        if record.birthday:
+            birthday = record.birthday.to_date()
+            bucket = day_of_year(birthday.month, birthday.day)
+            self.buckets[bucket].add(name)
+            self.days[name] = bucket
+
+    def remove(self, name):
+        bucket = self.days.pop(name, None)
+        if bucket is not None:
+            self.buckets[bucket].discard(name)
+
+    # Names of records with birthdays from <first> to <last> days after today, in order of dates
+    def names(self, first: int, last: int, today: date = None):
+        for _, name in self.upcoming(first, last, today):
+            yield name
+
+    # (days to birthday, name) of records with birthdays from <first> to <last> days after today, in order of dates
+    def upcoming(self, first: int, last: int, today: date = None):
+        for days, (month, day) in birthday_keys(first, last, today):
+            for name in sorted(self.buckets[day_of_year(month, day)]):
+                yield days, name
+
+    # Amount of records with birthday on the day
+    def count(self, month: int, day: int) -> int:
+        return len(self.buckets[day_of_year(month, day)])
+
+
+# Names of records in sorted order, so pages ordered by name can be taken by position
+class NameIndex(RecordIndex):
+    names_only = True
+
+    def __init__(self):
+        self.sorted_names = []
+
+    def build(self, records):
+        self.sorted_names = sorted(name for name, _ in records)
+
+    def add(self, name, record):
+        position = bisect_left(self.sorted_names, name)
+        if position == len(self.sorted_names) or self.sorted_names[position] != name:
+            insort(self.sorted_names, name)
+
+    def remove(self, name):
+        position = bisect_left(self.sorted_names, name)
+        if position < len(self.sorted_names) and self.sorted_names[position] == name:
+            del self.sorted_names[position]
+
+    # Name of the record doesn't change
+    def update(self, name, record):
+        self.add(name, record)
+
+    # Names in sorted order starting from position <start>
+    def names(self, start: int = 0):
+        sorted_names = self.sorted_names
+        position = start
+        # Names are read by position, so records added or deleted while iterating don't break it
+        while position < len(sorted_names):
+            yield sorted_names[position]
+            position += 1
+
+
+# Trigrams of lowercased names padded with spaces, so the beginning and the end of the name
+# have their own trigrams. Names are ranked by similarity of trigrams (Jaccard), so names with typos are found.
+# Only names that share a trigram with the text are scored
+class FuzzyIndex(RecordIndex):
+    names_only = True
+    # Names with lower similarity are not returned
+    MIN_SIMILARITY = 0.2
+
+    def __init__(self):
+        # trigram -> names
+        self.postings = {}
+        # name -> amount of trigrams of the name
+        self.sizes = {}
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        return ngrams(f" {text.lower()} ", 3)
+
+    def add(self, name, record):
+        if name in self.sizes:
+            return
+        grams = self.trigrams(name)
+        self.sizes[name] = len(grams)
+        for gram in grams:
+            names = self.postings.get(gram)
+            if names is None:
+                self.postings[gram] = {name}
+            else:
+                names.add(name)
+
+    def remove(self, name):
+        if self.sizes.pop(name, None) is None:
+            return
+        for gram in self.trigrams(name):
+            names = self.postings.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.postings[gram]
+
+    # Name of the record doesn't change
+    def update(self, name, record):
+        self.add(name, record)
+
+    # <count> names the most similar to the text: [(similarity, name)], the most similar first.
+    # Trigrams of the text are checked from the rarest one, names are scored when they are found first
+    # (they have none of the trigrams checked before). The threshold is the similarity of the <count>-th best
+    # name found so far (at least MIN_SIMILARITY): names that can't reach it with the rest of trigrams
+    # are not scored, and when the rest is too small for any new name, common trigrams are not checked at all
+    def search(self, text: str, count: int) -> list:
+        grams = self.trigrams(text)
+        size = len(grams)
+        if not size or count <= 0:
+            return []
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        threshold = self.MIN_SIMILARITY
+        # Similarities of the best <count> names (the worst first) and all names that reached the threshold
+        best = []
+        found = []
+        seen = set()
+        for position, names in enumerate(postings):
+            rest = size - position
+            if rest / size < threshold:
+                break
+            names = names - seen
+            seen |= names
+            for name in names:
+                name_size = self.sizes[name]
+                # The most similarity the name can have (all the rest trigrams are shared)
+                common = min(rest, name_size)
+                if common / (size + name_size - common) < threshold:
+                    continue
+                common = 1 + sum(name in later for later in postings[position + 1:])
+                score = common / (size + name_size - common)
+                if score < threshold:
+                    continue
+                found.append((-score, name))
+                if len(best) < count:
+                    heapq.heappush(best, score)
+                elif score > best[0]:
+                    heapq.heapreplace(best, score)
+                if len(best) == count:
+                    threshold = max(threshold, best[0])
+        return [(-score, name) for score, name in heapq.nsmallest(count, found)]
+
+
+# Lowercased words of the text
+def tokenize(text: str) -> list:
+    return re.findall(r'\w+', text.lower())
+
+
+# Inverted index over notes (words) and tags of the records
+class NotesIndex(RecordIndex):
+
+    def __init__(self):
+        # word -> {name: amount of the word in notes of the record}
+        self.words = {}
+        # tag -> {name: amount of notes of the record with the tag}
+        self.tags = {}
+        # name -> (words, tags) counters of the record
+        self.records = {}
+
+    def add(self, name, record):
+        self.add_notes(name, record.notes)
+
+    def add_notes(self, name, notes: dict):
+        self.remove(name)
+        if not notes:
+            return
+        words = Counter()
+        tags = Counter()
+        for note, tag in notes.items():
+            words.update(tokenize(note))
+            if tag:
+                tags[tag.lower()] += 1
+        self.records[name] = (words, tags)
+        for postings, counter in ((self.words, words), (self.tags, tags)):
+            for key, count in counter.items():
+                postings.setdefault(key, {})[name] = count
+
+    def remove(self, name):
+        counters = self.records.pop(name, None)
+        if counters is None:
+            return
+        for postings, counter in zip((self.words, self.tags), counters):
+            for key in counter:
+                names = postings[key]
+                del names[name]
+                if not names:
+                    del postings[key]
+
+    # Names of records which notes contain words of the text, the most relevant first
+    # (score is sum of tf-idf of the words, so rare words and records with all words rank higher)
+    def search(self, text: str) -> list:
+        scores = Counter()
+        for word in set(tokenize(text)):
+            names = self.words.get(word)
+            if not names:
+                continue
+            idf = math.log(1 + len(self.records) / len(names))
+            for name, count in names.items():
+                scores[name] += count * idf
+        return sorted(scores, key=lambda name: (-scores[name], name))
+
+    # Names of records that have notes with the tag, records with more such notes first
+    def search_tag(self, tag: str) -> list:
+        names = self.tags.get(tag.lower(), {})
+        return sorted(names, key=lambda name: (-names[name], name))
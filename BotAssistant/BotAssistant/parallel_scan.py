@@ -0,0 +1,83 @@
+import os
+import pickle
+
+
+# Books with less records are scanned by the calling thread (starting processes costs more than the scan)
+PARALLEL_MIN_RECORDS = 200000
+# Default amount of worker processes
+WORKERS = os.cpu_count() or 1
+
+# Shard of the book in worker process: (lowercased names, phone numbers of every record)
+_shard = None
+
+
+def _load_shard(payload: bytes):
+    global _shard
+    _shard = pickle.loads(payload)
+
+
+# Task that makes the worker process start and load its shard, returns amount of its records
+def _ready() -> int:
+    return len(_shard[0])
+
+
+# Positions (in the shard) of records which name contains text_lower or any phone contains text
+def _scan_shard(text: str, text_lower: str) -> list:
+    names, phones = _shard
+    return [position for position, name in enumerate(names)
+            if text_lower in name or any(text in phone for phone in phones[position])]
+
+
+# Split records (name, record) to <workers> shards: (original names of every shard,
+# shards of (lowercased names, phone numbers of every record))
+def split_shards(records, workers: int = WORKERS):
+    names = []
+    shards = []
+    records = list(records)
+    size = -(-len(records) // workers) or 1
+    for start in range(0, len(records), size):
+        shard = records[start:start + size]
+        names.append([name for name, _ in shard])
+        shards.append(([name.lower() for name, _ in shard], [tuple(record.phone_numbers()) for _, record in shard]))
+    return names, shards
+
+
+# Scans records of a large book by several processes (see AddressBook.search_records).
+# Names and phones are split to shards (see split_shards), every shard is scanned by its own process
+# that gets only this shard once at start, a query sends only the text.
+# The scanner is created for <version> of the book and must be created again after the book is changed.
+# Creating the scanner waits until all processes are started and loaded their shards
+class ParallelScanner:
+    def __init__(self, names: list, shards: list, version: int):
+        # Imported here, so the bot doesn't load them unless parallel scan is used
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+
+        self.version = version
+        # Original names of the records of every shard (results are positions in shards)
+        self.names = names
+        # Processes are spawned, so the threads of the bot (autosave, server) are not copied
+        context = multiprocessing.get_context('spawn')
+        self.executors = [ProcessPoolExecutor(1, context, initializer=_load_shard,
+                                              initargs=(pickle.dumps(shard, pickle.HIGHEST_PROTOCOL),))
+                          for shard in shards]
+        # A process is started by the first task, so the processes are started here and not by the first search
+        try:
+            for future in [executor.submit(_ready) for executor in self.executors]:
+                future.result()
+        except BaseException:
+            self.close()
+            raise
+
+    # Names of records that contain text in the name (case insensitive) or in any phone, in order of the book
+    def search(self, text: str) -> list:
+        text_lower = text.lower()
+        futures = [executor.submit(_scan_shard, text, text_lower) for executor in self.executors]
+        found = []
+        for names, future in zip(self.names, futures):
+            found.extend(names[position] for position in future.result())
+        return found
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,100 @@
+from abc import ABC, abstractmethod
+import json
+
+
+# Amount of pages formatted into one write to the sink
+PAGES_PER_WRITE = 100
+# Width of columns of the table format (longer values are not cut)
+NAME_WIDTH = 24
+BIRTHDAY_WIDTH = 12
+PHONES_WIDTH = 36
+
+
+# Formats pages of records to text. Pages are formatted as strings and written to the sink
+# in chunks (see write_pages), so printing a large book doesn't call print for every record
+class PageRenderer(ABC):
+    # Text written before the first page
+    def header(self) -> str:
+        return ""
+
+    # Text written after the last page
+    def footer(self) -> str:
+        return ""
+
+    @abstractmethod
+    def render_page(self, number: int, records) -> str:
+        pass
+
+
+# Default format, the same as Record.__str__ under "page N" lines
+class TextRenderer(PageRenderer):
+    def render_page(self, number, records):
+        return f"page {number}\n" + "".join(f"{record}\n" for record in records)
+
+
+class TableRenderer(PageRenderer):
+    ROW = f"{{:<{NAME_WIDTH}}} {{:<{BIRTHDAY_WIDTH}}} {{:<{PHONES_WIDTH}}} {{}}"
+
+    def header(self):
+        return self.ROW.format("Name", "Birthday", "Phones", "Notes") + "\n" + "-" * (NAME_WIDTH + BIRTHDAY_WIDTH + PHONES_WIDTH + 9) + "\n"
+
+    def render_page(self, number, records):
+        return f"page {number}\n" + "".join(
+            self.ROW.format(record.name.value,
+                            record.birthday.value if record.birthday else "",
+                            ", ".join(record.phone_numbers()),
+                            "; ".join(f"{note} #{tag}" if tag else note for note, tag in record.notes.items())).rstrip() + "\n"
+            for record in records)
+
+
+# JSON array of contacts (the same fields as the export to JSONL)
+class JsonRenderer(PageRenderer):
+    def __init__(self):
+        self.first = True
+
+    def header(self):
+        self.first = True
+        return "["
+
+    def footer(self):
+        return "]\n" if self.first else "\n]\n"
+
+    def render_page(self, number, records):
+        parts = []
+        for record in records:
+            parts.append("\n" if self.first else ",\n")
+            self.first = False
+            parts.append(json.dumps({
+                'name': record.name.value,
+                'phones': record.phone_numbers(),
+                'birthday': record.birthday.value if record.birthday else '',
+                'notes': record.notes,
+            }, ensure_ascii=False))
+        return "".join(parts)
+
+
+class RendererFactory:
+    FORMATS = {
+        'text': TextRenderer,
+        'table': TableRenderer,
+        'json': JsonRenderer,
+    }
+
+    def get_renderer(self, output_format):
+        renderer = self.FORMATS.get(output_format)
+        if renderer is None:
+            raise ValueError(f"Unknown output format {output_format}, use one of: {', '.join(self.FORMATS)}")
+        return renderer()
+
+
+# Write pages (lists of records) numbered from <first_page> to the file-like sink,
+# PAGES_PER_WRITE pages are formatted into one write
+def write_pages(pages, sink, renderer: PageRenderer, first_page: int = 1):
+    chunk = [renderer.header()]
+    for number, records in enumerate(pages, first_page):
+        chunk.append(renderer.render_page(number, records))
+        if len(chunk) >= PAGES_PER_WRITE:
+            sink.write("".join(chunk))
+            chunk = []
+    chunk.append(renderer.footer())
+    sink.write("".join(chunk))
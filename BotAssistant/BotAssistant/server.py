@@ -0,0 +1,122 @@
+from books import BookCache
+from bot import BotCLI, EXIT_COMMANDS
+from concurrent.futures import ThreadPoolExecutor
+from stats import STATS
+import asyncio
+import io
+import signal
+import sys
+import threading
+import traceback
+
+
+# Line that ends the response to every command
+END_OF_RESPONSE = "\x04"
+# Amount of threads that execute commands
+WORKERS = 8
+
+
+# Replacement of sys.stdout: handlers print results, so the output of a command executed
+# by worker thread goes to the buffer of this thread (other output goes to the real stdout)
+class SessionOutput(io.TextIOBase):
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            return self.stdout.write(text)
+        return buffer.write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stdout.flush()
+
+
+# Serves BotCLI sessions over TCP or Unix socket, all sessions share loaded address books
+# (a session works with the default book until use command). Import and export work with files
+# of files_dir only, without it they are not available to clients.
+# Protocol: client sends a command per line, response is the output of the command followed by END_OF_RESPONSE line
+class BotServer:
+    def __init__(self, books: BookCache, workers: int = WORKERS, files_dir: str = None):
+        self.books = books
+        self.files_dir = files_dir
+        self.executor = ThreadPoolExecutor(workers)
+        self.output = None
+
+    # Executed by worker thread, returns the output of the command.
+    # Commands that read the book are executed in parallel, commands that change it - exclusively (see BotCLI).
+    # Errors that are not handled by the command are sent to the client, the session goes on
+    def execute(self, bot: BotCLI, prop: str) -> str:
+        buffer = io.StringIO()
+        self.output.local.buffer = buffer
+        try:
+            bot.execute_command(prop)
+        except Exception as e:
+            traceback.print_exc()
+            buffer.write(f"Unable to execute the command: {e}\n")
+        finally:
+            self.output.local.buffer = None
+        return buffer.getvalue()
+
+    def create_bot(self) -> BotCLI:
+        return BotCLI(books=self.books, file_commands=self.files_dir is not None, files_dir=self.files_dir)
+
+    async def handle_session(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        bot = None
+        try:
+            # The default book may be loaded from file, so the bot is created by worker thread.
+            # If the book can't be loaded, the client gets the error and the session is closed
+            try:
+                bot = await loop.run_in_executor(self.executor, self.create_bot)
+            except Exception as e:
+                writer.write(f"Unable to load the address book: {e}\n{END_OF_RESPONSE}\n".encode())
+                await writer.drain()
+                return
+            while line := await reader.readline():
+                prop = line.decode(errors='replace').rstrip('\r\n')
+                # Session is closed, the book is saved when server stops
+                if prop.lower() in EXIT_COMMANDS:
+                    writer.write(f"Good bye!\n{END_OF_RESPONSE}\n".encode())
+                    await writer.drain()
+                    break
+                output = await loop.run_in_executor(self.executor, self.execute, bot, prop)
+                writer.write(f"{output}{END_OF_RESPONSE}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if bot is not None:
+                bot.release_book()
+            writer.close()
+
+    async def serve(self, host: str, port: int, unix_path: str = None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_session, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_session, host, port)
+        stop = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+            except NotImplementedError:
+                # Windows: Ctrl+C raises KeyboardInterrupt
+                pass
+        async with server:
+            await stop.wait()
+
+    # Serve until interrupted (Ctrl+C or SIGTERM), then save the books
+    def run(self, host: str, port: int, unix_path: str = None):
+        self.output = SessionOutput(sys.stdout)
+        sys.stdout = self.output
+        try:
+            asyncio.run(self.serve(host, port, unix_path))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sys.stdout = self.output.stdout
+            self.executor.shutdown()
+            self.books.close()
+            STATS.dump()
@@ -0,0 +1,126 @@
+import json
+import math
+import threading
+import time
+
+
+# Histogram of latencies with logarithmic buckets, so memory doesn't grow with the amount of calls
+class LatencyHistogram:
+    # Every bucket is ~9% wider than the previous one, percentiles are precise within this error
+    GROWTH = 2 ** 0.125
+    # Upper bound of the first bucket (seconds)
+    MIN_SECONDS = 1e-6
+
+    def __init__(self):
+        # bucket -> amount of calls
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        if seconds <= self.MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = int(math.log(seconds / self.MIN_SECONDS, self.GROWTH)) + 1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    # Latency (seconds) that <percent> percent of calls don't exceed
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.MIN_SECONDS * self.GROWTH ** bucket, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+# Calls and latencies of commands and storage operations (load, save).
+# Disabled statistics cost one attribute check per command
+class CommandStats:
+    def __init__(self):
+        self.enabled = False
+        # File the statistics are written to on exit (JSON)
+        self.dump_file = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.monotonic()
+            self.commands = {}
+            self.storage = {}
+
+    def enable(self, dump_file: str = None):
+        self.enabled = True
+        if dump_file:
+            self.dump_file = dump_file
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, command: str, seconds: float):
+        self._record(self.commands, command, seconds)
+
+    def record_storage(self, operation: str, seconds: float):
+        if self.enabled:
+            self._record(self.storage, operation, seconds)
+
+    def _record(self, histograms: dict, name: str, seconds: float):
+        # Commands can be executed by several threads (see server)
+        with self.lock:
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            uptime = time.monotonic() - self.started
+            calls = sum(histogram.count for histogram in self.commands.values())
+            return {
+                'uptime_seconds': uptime,
+                'commands_total': calls,
+                'commands_per_second': calls / uptime if uptime else 0.0,
+                'commands': {name: histogram.to_dict() for name, histogram in sorted(self.commands.items())},
+                'storage': {name: histogram.to_dict() for name, histogram in sorted(self.storage.items())},
+            }
+
+    def report(self) -> str:
+        stats = self.to_dict()
+        lines = [f"Uptime {stats['uptime_seconds']:.1f}s, {stats['commands_total']} commands, "
+                 f"{stats['commands_per_second']:.2f} commands/second",
+                 f"{'':<18}{'calls':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for title, histograms in (("Commands:", stats['commands']), ("Storage:", stats['storage'])):
+            if histograms:
+                lines.append(title)
+            for name, values in histograms.items():
+                lines.append(f"  {name:<16}{values['calls']:>8}{values['mean_ms']:>10.3f}{values['p50_ms']:>10.3f}"
+                             f"{values['p95_ms']:>10.3f}{values['p99_ms']:>10.3f}{values['max_ms']:>10.3f}")
+        return "\n".join(lines)
+
+    # Write statistics to dump_file (if set)
+    def dump(self):
+        if self.enabled and self.dump_file:
+            with open(self.dump_file, 'w') as file:
+                json.dump(self.to_dict(), file, indent=2)
+
+
+# Statistics of the process
+STATS = CommandStats()
@@ -4,7 +4,8 @@ setup(
     name = "Organizer",
     version="1.0",
     entry_point={
-        "console_scripts":["bot-start=BotAssistant.bot_assistant_launcher:main"]
+        "console_scripts":["bot-start=BotAssistant.bot_assistant_launcher:main",
+                           "bot-server=BotAssistant.bot_assistant_launcher:server_main"]
          },
         package=find_packages()
       )
\ No newline at end of file
@@ -0,0 +1,63 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+# Modules of the bot import each other by plain names (as when the launcher is run from its directory)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "BotAssistant"))
+
+from address_book import AddressBook, Record
+
+
+# Connectors keep books in ./BotAssistant/BotAssistant/res, so every test works in its own directory
+@pytest.fixture
+def storage_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    res = tmp_path / "BotAssistant" / "BotAssistant" / "res"
+    res.mkdir(parents=True)
+    return res
+
+
+def make_record(name, phones=(), birthday="", notes=None):
+    record = Record(name, birthday)
+    for phone in phones:
+        record.add_phone(phone)
+    for note, tag in (notes or {}).items():
+        record.add_note(note, tag)
+    return record
+
+
+# Book with contacts that have every kind of field
+def make_book(book=None):
+    book = AddressBook() if book is None else book
+    book.add_record(make_record("Ann", ["0501234567"], "1990-02-28", {"likes tea": "food"}))
+    book.add_record(make_record("Bob", ["0670000001", "0670000002"]))
+    book.add_record(make_record("Carl", [], "2000-02-29", {"call back": "", "owes money": "work"}))
+    book.add_record(make_record("Dana", ["0931112233"], "1985-12-31"))
+    return book
+
+
+# Contents of the book that are compared in tests: name -> (birthday, phones, notes), in order of adding
+def book_state(book):
+    return [(name, state(book.data[name])) for name in book.data]
+
+
+def state(record):
+    birthday = record.birthday.value if record.birthday else None
+    return (birthday, record.phone_numbers(), dict(record.notes))
+
+
+# Index updated by changes of the book is the same as the index built from the changed book
+# (numbers of records in order of adding may have gaps, so only their order is compared)
+def check_index(book, index_type):
+    built = index_type()
+    built.build(((name, None) for name in book.data) if built.names_only else book.data.items())
+    assert index_state(book._indexes[index_type]) == index_state(built)
+
+
+def index_state(index):
+    state = dict(vars(index))
+    if "order" in state:
+        state["order"] = sorted(state["order"], key=state["order"].get)
+        del state["added"]
+    return state
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from address_book import AddressBook
+from autosave import AutoSaver, start_autosave
+from conftest import book_state, make_book, make_record
+
+FILE_STORAGES = ["binary", "compact", "mmap"]
+
+
+def recover(storage_type):
+    return AddressBook().recover_address_book(storage_type)
+
+
+def wait_saved(book, timeout=5):
+    deadline = time.monotonic() + timeout
+    while book.dirty and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not book.dirty
+
+
+@pytest.mark.parametrize("storage_type", FILE_STORAGES)
+def test_changed_book_is_saved(storage_dir, storage_type):
+    book = recover(storage_type)
+    saver = AutoSaver(book, interval=0.05)
+    saver.start()
+    try:
+        with book.lock.write():
+            make_book(book)
+        assert wait_saved(book)
+    finally:
+        saver.stop()
+    assert book_state(recover(storage_type)) == book_state(book)
+
+
+def test_amount_of_changes_triggers_save(storage_dir):
+    book = recover("binary")
+    saver = AutoSaver(book, interval=60, changes=3)
+    saver.start()
+    try:
+        with book.lock.write():
+            make_book(book)
+        assert wait_saved(book)
+    finally:
+        saver.stop()
+
+
+def test_connectors_that_save_changes_have_no_autosave(storage_dir):
+    assert start_autosave(recover("journal")) is None
+    assert start_autosave(AddressBook()) is None
+
+
+# Commands change the book while it's saved, the changes are saved by the next save
+@pytest.mark.parametrize("storage_type", FILE_STORAGES)
+def test_changes_during_save_are_kept(storage_dir, storage_type):
+    book = recover(storage_type)
+    saver = AutoSaver(book, interval=0.01, changes=5)
+    saver.start()
+
+    def add_contacts(thread):
+        for number in range(100):
+            with book.lock.write():
+                book.add_record(make_record(f"T{thread}-{number}", [f"{thread:02}{number:08}"]))
+
+    threads = [threading.Thread(target=add_contacts, args=(thread,)) for thread in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert wait_saved(book)
+    finally:
+        saver.stop()
+    assert len(recover(storage_type).data) == 300
+
+
+# The contact changed while the snapshot is written is based on its state in the snapshot,
+# so the next merge with changes of other process doesn't restore the removed phone
+@pytest.mark.parametrize("storage_type", ["binary", "compact"])
+def test_change_during_save_is_not_a_conflict(storage_dir, storage_type, capsys):
+    book = make_book(recover(storage_type))
+    book.find("Ann").remove_phone("0501234567")
+    book.find("Ann").add_phone("0500000001")
+    book.save_address_book(storage_type)
+    ours = recover(storage_type)
+    theirs = recover(storage_type)
+    theirs.find("Bob").add_phone("0670000009")
+    theirs.save_address_book(storage_type)
+
+    connector = ours._connector
+    ours.find("Ann").add_phone("0500000002")
+    snapshot = connector.snapshot(ours)
+    ours.find("Ann").remove_phone("0500000002")
+    connector.restore_save_state(ours, connector.save_snapshot(snapshot))
+    ours.save_address_book(storage_type)
+
+    book = recover(storage_type)
+    assert book.find("Ann").phone_numbers() == ["0500000001"]
+    assert book.find("Bob").phone_numbers() == ["0670000001", "0670000002", "0670000009"]
+    assert "Ann" not in capsys.readouterr().err
+
+
+# The mmap book maps the new file after it's saved, so the save waits for commands that read the book
+def test_mmap_book_is_not_saved_while_it_is_read(storage_dir):
+    make_book(recover("mmap")).save_address_book("mmap")
+    book = recover("mmap")
+    book.add_record(make_record("Eve", ["0440000000"]))
+    saver = AutoSaver(book)
+    reading = threading.Event()
+    names = []
+
+    def show_all():
+        with book.lock.read():
+            for name, record in book.data.items():
+                names.append(record.name.value)
+                reading.set()
+                time.sleep(0.05)
+
+    reader = threading.Thread(target=show_all)
+    reader.start()
+    reading.wait()
+    saver.save()
+    reader.join()
+    assert names == ["Ann", "Bob", "Carl", "Dana", "Eve"]
+    assert not book.dirty
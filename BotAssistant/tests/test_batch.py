@@ -0,0 +1,70 @@
+import io
+
+from address_book import AddressBook
+import bot as bot_module
+from bot import BotCLI
+from conftest import book_state
+
+SCRIPT = """# contacts of the team
+add Ann 0501234567
+
+add Bob 0670000001
+set_birthday Ann 1990-02-28
+phone Ann
+exit
+add Carl 0931112233
+"""
+
+
+def recover(storage_type):
+    return AddressBook().recover_address_book(storage_type)
+
+
+# Empty lines and comments are skipped, the script ends with exit command, the book is saved at the end
+def test_batch_executes_commands_until_exit(storage_dir):
+    bot = BotCLI("binary", autosave=False)
+    output = io.StringIO()
+    assert bot.run_batch(io.StringIO(SCRIPT), output) == 4
+    assert output.getvalue().splitlines() == [
+        "Contact Ann 0501234567 is added to DBMS",
+        "Contact Bob 0670000001 is added to DBMS",
+        "Birthday date 1990-02-28 was added(changed) for contact Ann",
+        " The contact Ann has phone numbers: ['0501234567']",
+    ]
+    book = recover("binary")
+    assert list(book.data) == ["Ann", "Bob"]
+    assert book.find("Ann").birthday.value == "1990-02-28"
+
+
+# Changes of the batch are passed to the connector together, with the last state of every contact
+def test_batch_changes_are_persisted_together(storage_dir, monkeypatch):
+    bot = BotCLI("journal", autosave=False)
+    connector = bot.phone_book._connector
+    logged = []
+    log_changes = connector.log_changes
+
+    def log_names(book, changes):
+        logged.append([name for name, _ in changes])
+        log_changes(book, changes)
+
+    monkeypatch.setattr(connector, "log_change", lambda *args: logged.append(args))
+    monkeypatch.setattr(connector, "log_changes", log_names)
+    bot.run_batch(io.StringIO(SCRIPT), io.StringIO())
+    assert logged == [["Ann", "Bob"]]
+    assert book_state(recover("journal")) == book_state(bot.phone_book)
+
+
+# Output is written after every BATCH_FLUSH_EVERY commands, not only at the end
+def test_output_is_flushed_during_batch(storage_dir, monkeypatch):
+    monkeypatch.setattr(bot_module, "BATCH_FLUSH_EVERY", 2)
+    writes = []
+
+    class Output:
+        def write(self, text):
+            writes.append(text)
+
+        def flush(self):
+            pass
+
+    BotCLI("binary", autosave=False).run_batch(io.StringIO(SCRIPT), Output())
+    assert [text.count("\n") for text in writes] == [2, 2, 0]
@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+
+from conftest import check_index, make_book, make_record
+from indexes import BirthdayIndex, birthday_histogram, birthday_keys, day_of_year
+
+
+def test_day_of_year_has_bucket_for_29_february():
+    assert day_of_year(1, 1) == 0
+    assert day_of_year(2, 29) == 59
+    assert day_of_year(3, 1) == 60
+    assert day_of_year(12, 31) == 365
+
+
+# In non leap years 29 February birthdays are celebrated on 1 March
+def test_birthday_keys_in_non_leap_year():
+    keys = list(birthday_keys(1, 3, date(2023, 2, 27)))
+    assert keys == [(1, (2, 28)), (2, (2, 29)), (2, (3, 1)), (3, (3, 2))]
+
+
+def test_birthday_keys_in_leap_year():
+    keys = list(birthday_keys(1, 3, date(2024, 2, 27)))
+    assert keys == [(1, (2, 28)), (2, (2, 29)), (3, (3, 1))]
+
+
+def test_birthday_keys_cross_the_year():
+    keys = list(birthday_keys(3, 5, date(2023, 12, 29)))
+    assert keys == [(3, (1, 1)), (4, (1, 2)), (5, (1, 3))]
+
+
+# Every day of the year is met once, even if the period is longer than a year
+@pytest.mark.parametrize("today", [date(2023, 3, 15), date(2024, 1, 1), date(2023, 2, 28)])
+def test_birthday_keys_within_year(today):
+    keys = [key for _, key in birthday_keys(1, 1000, today)]
+    assert len(keys) == len(set(keys)) == 366
+
+
+def test_birthday_histogram_counts_by_week():
+    today = date(2023, 12, 25)
+    counts = {(12, 26): 1, (1, 1): 2, (1, 2): 3}
+    histogram = birthday_histogram(2, lambda month, day: counts.get((month, day), 0), today)
+    # The first week is from 26 to 1 January, the second from 2 to 8 January
+    assert histogram == [3, 3]
+
+
+def test_birthday_index_upcoming():
+    index = BirthdayIndex()
+    index.add("Ann", make_record("Ann", birthday="1990-03-01"))
+    index.add("Bob", make_record("Bob", birthday="2000-02-29"))
+    index.add("Carl", make_record("Carl", birthday="1980-02-28"))
+    index.add("Dana", make_record("Dana"))
+    today = date(2023, 2, 26)
+    assert list(index.upcoming(1, 7, today)) == [(2, "Carl"), (3, "Bob"), (3, "Ann")]
+    assert list(index.names(3, 3, today)) == ["Bob", "Ann"]
+    assert index.count(2, 29) == 1
+    index.remove("Bob")
+    assert list(index.names(1, 7, today)) == ["Carl", "Ann"]
+
+
+def test_days_to_birthday_matches_index():
+    book = make_book()
+    expected = {name: book.data[name].days_to_birthday() for name in book.data if book.data[name].birthday}
+    upcoming = {name: days for days, name in book.upcoming_birthdays(366)}
+    assert upcoming == expected
+
+
+def test_index_after_changes():
+    book = make_book()
+    book.upcoming_birthdays(30)
+    book.find("Ann").add_birthday("1990-06-15")
+    book.find("Bob").add_birthday("2000-02-29")
+    book.add_record(make_record("Eve", birthday="1999-01-01"))
+    book.add_record(make_record("Dana"))
+    book.delete("Carl")
+    check_index(book, BirthdayIndex)
+    assert [name for _, name in book.upcoming_birthdays(366)] == [
+        name for name in sorted(book.data, key=lambda name: book.data[name].days_to_birthday() or 0)
+        if book.data[name].birthday]
@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+from address_book import AddressBook
+from books import BYTES_PER_CONTACT, BookCache
+from bot import BotCLI
+from conftest import make_book, make_record
+
+
+def test_acquire_loads_book_once(storage_dir):
+    books = BookCache("binary", autosave=False)
+    book = books.acquire("work")
+    assert books.acquire("work") is book
+    books.acquire()
+    assert books.loaded() == ["phone_book", "work"]
+
+
+def test_book_name_is_checked(storage_dir):
+    with pytest.raises(ValueError):
+        BookCache("binary", autosave=False).acquire("../secret")
+
+
+# The least recently used book that no bot uses is saved and unloaded
+def test_unused_books_are_evicted(storage_dir):
+    books = BookCache("binary", memory_budget=5 * BYTES_PER_CONTACT, autosave=False)
+    work = books.acquire("work")
+    make_book(work)
+    books.release("work")
+    home = books.acquire("home")
+    make_book(home)
+    books.acquire("other")
+    assert books.loaded() == ["other", "home"]
+    assert list(AddressBook().recover_address_book("binary", "work").data) == ["Ann", "Bob", "Carl", "Dana"]
+    # The used book is kept, even if the books don't fit the budget
+    books.acquire("more")
+    assert "home" in books.loaded()
+
+
+def test_close_saves_books(storage_dir):
+    books = BookCache("binary", autosave=False)
+    make_book(books.acquire("work"))
+    books.close()
+    assert books.loaded() == []
+    assert os.path.isfile(os.path.join(storage_dir, "work.dat"))
+    assert len(AddressBook().recover_address_book("binary", "work").data) == 4
+
+
+# Changes of the batch are kept until it ends, so its book is not unloaded when the script uses other books
+@pytest.mark.parametrize("storage_type", ["journal", "binary"])
+def test_batch_book_is_not_unloaded(storage_dir, storage_type, capsys):
+    bot = BotCLI(storage_type, memory_budget=100, autosave=False)
+    script = ["add A 0000000001", "use b2", "use b3", "use phone_book", "change A 0000000001 0000000009"]
+    assert bot.run_batch(script, io.StringIO()) == 5
+    assert AddressBook().recover_address_book(storage_type).find("A").phone_numbers() == ["0000000009"]
+    assert "changed by another process" not in capsys.readouterr().err
+
+
+def test_shared_book_is_released_by_session(storage_dir):
+    books = BookCache("binary", memory_budget=0, autosave=False)
+    bot = BotCLI(books=books)
+    bot.phone_book.add_record(make_record("Ann"))
+    bot.release_book()
+    # Loading another book unloads the released one
+    books.acquire("work")
+    assert books.loaded() == ["work"]
+    assert list(AddressBook().recover_address_book("binary").data) == ["Ann"]
@@ -0,0 +1,51 @@
+import os
+import struct
+
+import pytest
+
+from address_book import AddressBook
+from conftest import book_state, make_book
+import codec
+from db_connector import CompactFileDBConnector
+
+
+def recover(storage_type):
+    return AddressBook().recover_address_book(storage_type)
+
+
+def test_compact_migrates_pickled_book(storage_dir):
+    book = make_book()
+    book.save_address_book("binary")
+    assert not os.path.isfile(CompactFileDBConnector.FILENAME)
+    assert book_state(recover("compact")) == book_state(book)
+    with open(CompactFileDBConnector.FILENAME, "rb") as file:
+        assert codec.is_encoded(file.read())
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_codec_round_trip(compress):
+    book = make_book()
+    data = codec.encode_book(book, compress)
+    assert book_state(codec.decode_book(data)) == book_state(book)
+
+
+def test_codec_rejects_newer_schema():
+    data = bytearray(codec.encode_book(make_book()))
+    struct.pack_into("<H", data, len(codec.MAGIC), codec.SCHEMA_VERSION + 1)
+    with pytest.raises(ValueError, match="format version"):
+        codec.decode_book(bytes(data))
+
+
+def test_codec_rejects_other_data():
+    with pytest.raises(ValueError):
+        codec.decode_book(b"NOTABOOK" + bytes(codec.HEADER.size))
+
+
+# Birthdays and phones are restored without validation, notes keep their tags
+def test_codec_keeps_fields():
+    book = make_book()
+    book.find("Bob").add_note("no tag")
+    decoded = codec.decode_book(codec.encode_book(book))
+    assert decoded.find("Carl").birthday.to_date().isoformat() == "2000-02-29"
+    assert decoded.find("Bob").notes == {"no tag": ""}
+    assert decoded.find("Ann")._book is decoded
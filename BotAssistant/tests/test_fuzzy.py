@@ -0,0 +1,55 @@
+import heapq
+import random
+
+import pytest
+
+from benchmarks.generator import generate_records
+from conftest import check_index, make_book, make_record
+from indexes import FuzzyIndex
+
+
+# Similarity of every name computed one by one
+def brute_force(index, text, count):
+    grams = index.trigrams(text)
+    found = []
+    for name, size in index.sizes.items():
+        common = len(grams & index.trigrams(name))
+        score = common / (len(grams) + size - common)
+        if score >= index.MIN_SIMILARITY:
+            found.append((-score, name))
+    return [(-score, name) for score, name in heapq.nsmallest(count, found)]
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = FuzzyIndex()
+    index.build((record.name.value, None) for record in generate_records(3000))
+    return index
+
+
+def test_search_matches_brute_force(index):
+    random.seed(1)
+    names = list(index.sizes)
+    # Names with a missed letter, as typed with a typo
+    texts = ["olena shevcenko", "ivan", "xyz", "a"] + [
+        name[:len(name) // 2] + name[len(name) // 2 + 1:] for name in random.sample(names, 50)]
+    for text in texts:
+        for count in (1, 10):
+            assert index.search(text, count) == brute_force(index, text, count), text
+
+
+def test_search_finds_name_with_typo():
+    book = make_book()
+    book.add_record(make_record("Annabel Lee"))
+    assert list(book.fuzzy_search("Anabel", 1).data) == ["Annabel Lee"]
+
+
+def test_index_after_changes():
+    book = make_book()
+    book.fuzzy_search("Ann")
+    book.add_record(make_record("Anna"))
+    book.add_records([make_record("Joanne"), make_record("Ann")])
+    book.delete("Bob")
+    check_index(book, FuzzyIndex)
+    assert "Bob" not in book.fuzzy_search("Bob").data
+    assert list(book.fuzzy_search("Anna", 1).data) == ["Anna"]
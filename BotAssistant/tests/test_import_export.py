@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from address_book import AddressBook
+from conftest import book_state, make_book
+from import_export import export_records, import_records
+
+
+@pytest.mark.parametrize("extension", ["csv", "jsonl"])
+def test_export_and_import_keep_contacts(tmp_path, extension):
+    book = make_book()
+    filename = str(tmp_path / f"contacts.{extension}")
+    assert export_records(book, filename) == 4
+    imported = AddressBook()
+    assert import_records(imported, filename) == (4, 0, [])
+    assert book_state(imported) == book_state(book)
+
+
+def test_imported_contacts_replace_contacts_with_the_same_name(tmp_path):
+    filename = tmp_path / "contacts.jsonl"
+    filename.write_text(json.dumps({"name": "Ann", "phones": ["0509999999"]}) + "\n", encoding="utf-8")
+    book = make_book()
+    import_records(book, str(filename))
+    assert book.find("Ann").phone_numbers() == ["0509999999"]
+    assert list(book.data) == ["Ann", "Bob", "Carl", "Dana"]
+
+
+# Invalid rows are rejected and reported, valid rows of the file are imported
+def test_invalid_rows_are_rejected(tmp_path):
+    filename = tmp_path / "contacts.csv"
+    filename.write_text("name,phones,birthday,notes\n"
+                        "Ann,0501234567;0501234568,1990-02-28,\n"
+                        "Bob,12345,,\n"
+                        "Carl,,not a date,\n"
+                        "Dana,,,\"{\"\"call back\"\": \"\"work\"\"}\"\n", encoding="utf-8")
+    book = AddressBook()
+    imported, rejected, errors = import_records(book, str(filename))
+    assert (imported, rejected) == (2, 2)
+    assert [error.split(":")[0] for error in errors] == ["line 3", "line 4"]
+    assert book.find("Ann").phone_numbers() == ["0501234567", "0501234568"]
+    assert book.find("Dana").notes == {"call back": "work"}
+
+
+def test_row_without_name_is_rejected(tmp_path):
+    filename = tmp_path / "contacts.jsonl"
+    filename.write_text('{"phones": ["0501234567"]}\n\n{"name": "Ann"}\n', encoding="utf-8")
+    book = AddressBook()
+    assert import_records(book, str(filename)) == (1, 1, ["line 1: field 'name' is missing"])
+
+
+# Rows are added to the book in batches, every batch is one change of the book
+def test_rows_are_added_in_batches(tmp_path):
+    filename = str(tmp_path / "contacts.jsonl")
+    export_records(make_book(), filename)
+    book = AddressBook()
+    import_records(book, filename, batch_size=3)
+    assert book.version == 2
+    assert list(book.data) == ["Ann", "Bob", "Carl", "Dana"]
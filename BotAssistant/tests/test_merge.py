@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import pickle
+
+import pytest
+
+from address_book import AddressBook
+from conftest import book_state, make_book, make_record, state
+from db_connector import JournalFileDBConnector, merge_records, record_state
+
+STORAGE_TYPES = ["binary", "journal", "compact"]
+PROCESSES = 3
+CONTACTS = 20
+
+
+def recover(storage_type):
+    return AddressBook().recover_address_book(storage_type)
+
+
+# Executed by child process: adds contacts and saves the book after every change, as bots working with the same file
+def add_contacts(directory, storage_type, process):
+    os.chdir(directory)
+    book = recover(storage_type)
+    for number in range(CONTACTS):
+        book.add_record(make_record(f"P{process}-{number}", [f"{process:02}{number:08}"]))
+        book.save_address_book(storage_type)
+
+
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_processes_keep_each_others_contacts(storage_dir, tmp_path, storage_type):
+    make_book(recover(storage_type)).save_address_book(storage_type)
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=add_contacts, args=(str(tmp_path), storage_type, process))
+                 for process in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * PROCESSES
+
+    names = set(recover(storage_type).data)
+    expected = {f"P{process}-{number}" for process in range(PROCESSES) for number in range(CONTACTS)}
+    assert names == expected | {"Ann", "Bob", "Carl", "Dana"}
+
+
+# Two books recovered from the same file stand for two processes
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_changes_of_different_contacts_are_kept(storage_dir, storage_type):
+    make_book(recover(storage_type)).save_address_book(storage_type)
+    ours = recover(storage_type)
+    theirs = recover(storage_type)
+    theirs.delete("Bob")
+    theirs.add_record(make_record("Eve", ["0440000000"]))
+    theirs.save_address_book(storage_type)
+    ours.find("Carl").add_phone("0501111111")
+    ours.save_address_book(storage_type)
+
+    book = recover(storage_type)
+    assert set(book.data) == {"Ann", "Carl", "Dana", "Eve"}
+    assert book.find("Carl").phone_numbers() == ["0501111111"]
+    # The book in memory gets the changes of other process on the next recovery only
+    assert "Bob" in ours.data
+
+
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_changes_of_the_same_contact_are_merged(storage_dir, storage_type, capsys):
+    make_book(recover(storage_type)).save_address_book(storage_type)
+    ours = recover(storage_type)
+    theirs = recover(storage_type)
+    theirs.find("Ann").add_birthday("1991-03-01")
+    theirs.find("Ann").remove_phone("0501234567")
+    theirs.find("Ann").add_note("met at work", "work")
+    theirs.save_address_book(storage_type)
+    ours.find("Ann").add_phone("0509999999")
+    ours.find("Ann").edit_tag("likes tea", "drinks")
+    ours.save_address_book(storage_type)
+
+    record = recover(storage_type).find("Ann")
+    assert record.birthday.value == "1991-03-01"
+    assert record.phone_numbers() == ["0509999999"]
+    assert record.notes == {"likes tea": "drinks", "met at work": "work"}
+    assert "Ann" in capsys.readouterr().err
+
+
+# The contact deleted by one process and changed by another one is kept with the changes
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_changed_contact_deleted_by_other_process(storage_dir, storage_type):
+    make_book(recover(storage_type)).save_address_book(storage_type)
+    ours = recover(storage_type)
+    theirs = recover(storage_type)
+    theirs.delete("Dana")
+    theirs.save_address_book(storage_type)
+    ours.find("Dana").add_phone("0932223344")
+    ours.save_address_book(storage_type)
+
+    record = recover(storage_type).find("Dana")
+    assert record.phone_numbers() == ["0931112233", "0932223344"]
+
+
+# Saving the unchanged book doesn't drop changes of other processes
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_unchanged_book_keeps_other_changes(storage_dir, storage_type):
+    book = make_book(recover(storage_type))
+    book.save_address_book(storage_type)
+    ours = recover(storage_type)
+    theirs = recover(storage_type)
+    theirs.find("Bob").add_phone("0670000009")
+    theirs.save_address_book(storage_type)
+    ours.save_address_book(storage_type)
+    assert book_state(recover(storage_type)) == book_state(theirs)
+
+
+def test_merge_records_keeps_changes_of_both():
+    base = record_state(make_record("Ann", ["0500000001", "0500000002"], "1990-01-01", {"a": "", "b": "x"}))
+    ours = make_record("Ann", ["0500000001", "0500000003"], "1990-01-01", {"a": "", "b": "y"})
+    theirs = make_record("Ann", ["0500000002", "0500000004"], "1991-01-01", {"a": "", "b": "x", "c": ""})
+    merged = merge_records("Ann", base, ours, theirs)
+    assert state(merged) == ("1991-01-01", ["0500000004", "0500000003"], {"a": "", "b": "y", "c": ""})
+
+
+# Journals written before entries had the base state are replayed as before
+def test_journal_entries_without_base(storage_dir):
+    connector = JournalFileDBConnector()
+    with open(connector.journal_filename(), "wb") as file:
+        pickle.dump(("Ann", make_record("Ann", ["0500000001"])), file)
+        pickle.dump(("Bob", make_record("Bob")), file)
+        pickle.dump(("Ann", None), file)
+    assert list(recover("journal").data) == ["Bob"]
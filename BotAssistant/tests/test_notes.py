@@ -0,0 +1,57 @@
+from conftest import check_index, make_book, make_record
+from indexes import NotesIndex
+
+
+def make_indexed_book():
+    book = make_book()
+    book.search_notes("tea")
+    return book
+
+
+def test_search_by_words_and_tag():
+    book = make_indexed_book()
+    book.find("Dana").add_note("tea with lemon", "food")
+    # Contacts with the same score are ordered by name
+    assert list(book.search_notes("tea").data) == ["Ann", "Dana"]
+    assert list(book.search_notes("lemon tea").data) == ["Dana", "Ann"]
+    assert sorted(book.search_tag("food").data) == ["Ann", "Dana"]
+    assert book.search_notes("coffee").data == {}
+
+
+def test_index_after_add():
+    book = make_indexed_book()
+    book.add_record(make_record("Anna", ["0501234560"], notes={"tea lover": "food"}))
+    book.add_records([make_record("Eve", notes={"gym": "sport"}), make_record("Fay")])
+    check_index(book, NotesIndex)
+    assert list(book.search_tag("sport").data) == ["Eve"]
+
+
+def test_index_after_edit():
+    book = make_indexed_book()
+    ann = book.find("Ann")
+    ann.edit_note("likes tea", "likes coffee")
+    ann.edit_tag("likes coffee", "drinks")
+    book.find("Carl").delete_note("call back")
+    book.find("Dana").add_note("new year", "holiday")
+    check_index(book, NotesIndex)
+    assert list(book.search_tag("drinks").data) == ["Ann"]
+    assert book.search_notes("tea").data == {}
+    assert list(book.search_notes("year").data) == ["Dana"]
+
+
+def test_index_after_delete():
+    book = make_indexed_book()
+    book.delete("Ann")
+    book.delete("Carl")
+    check_index(book, NotesIndex)
+    assert book.search_notes("money").data == {}
+    assert book.search_tag("food").data == {}
+
+
+# Replaced record is indexed with its new notes
+def test_index_after_replace():
+    book = make_indexed_book()
+    book.add_record(make_record("Ann", notes={"new": "work"}))
+    check_index(book, NotesIndex)
+    assert book.search_notes("tea").data == {}
+    assert sorted(book.search_tag("work").data) == ["Ann", "Carl"]
@@ -0,0 +1,44 @@
+import pytest
+
+import address_book
+from conftest import check_index, make_book, make_record
+from indexes import NameIndex
+
+
+@pytest.fixture
+def book(monkeypatch):
+    monkeypatch.setattr(address_book, "ROWS_PER_PAGE", 2)
+    book = make_book()
+    book.add_record(make_record("Abe"))
+    return book
+
+
+def page_names(pages):
+    return [[record.name.value for record in page] for page in pages]
+
+
+def test_pages_in_order_of_adding(book):
+    assert page_names(book.pages()) == [["Ann", "Bob"], ["Carl", "Dana"], ["Abe"]]
+    assert page_names(book.pages(1)) == [["Carl", "Dana"], ["Abe"]]
+
+
+def test_pages_by_name(book):
+    assert page_names(book.pages(by_name=True)) == [["Abe", "Ann"], ["Bob", "Carl"], ["Dana"]]
+    assert page_names(book.pages(2, by_name=True)) == [["Dana"]]
+
+
+def test_name_index_after_changes(book):
+    list(book.pages(by_name=True))
+    book.add_record(make_record("Aaron"))
+    book.add_records([make_record("Zoe"), make_record("Bob")])
+    book.delete("Carl")
+    check_index(book, NameIndex)
+    assert page_names(book.pages(by_name=True)) == [["Aaron", "Abe"], ["Ann", "Bob"], ["Dana", "Zoe"]]
+
+
+# Pages are read when requested, so records added meanwhile are on the next pages
+def test_cursor_reads_pages_on_demand(book):
+    pages = book.pages(by_name=True)
+    assert page_names([next(pages)]) == [["Abe", "Ann"]]
+    book.add_record(make_record("Eve"))
+    assert page_names(pages) == [["Bob", "Carl"], ["Dana", "Eve"]]
@@ -0,0 +1,44 @@
+import pytest
+
+import address_book
+from address_book import AddressBook
+from conftest import make_record
+from parallel_scan import _ready
+
+WORKERS = 3
+
+
+@pytest.fixture
+def book(monkeypatch):
+    monkeypatch.setattr(address_book, "PARALLEL_MIN_RECORDS", 1)
+    book = AddressBook()
+    for number in range(30):
+        book.add_record(make_record(f"Name{number:02}", [f"05000000{number:02}"]))
+    book.parallel_workers = WORKERS
+    yield book
+    if book._scanner is not None:
+        book._scanner.close()
+
+
+# Processes are started and have loaded their shards when the scanner is ready
+def test_every_process_gets_its_shard(book):
+    book.start_scanner(wait=True)
+    scanner = book._scanner
+    assert [executor.submit(_ready).result() for executor in scanner.executors] == [10, 10, 10]
+
+
+def test_results_are_the_same_as_of_scan_by_thread(book):
+    # The book is scanned by the calling thread until the scanner is ready
+    assert book.parallel_search("name1") is None
+    book.start_scanner(wait=True)
+    assert book.parallel_search("name1") == [f"Name1{number}" for number in range(10)]
+    assert book.parallel_search("0500000025") == ["Name25"]
+    assert book.parallel_search("nobody") == []
+
+
+def test_changed_book_gets_new_scanner(book):
+    book.start_scanner(wait=True)
+    book.add_record(make_record("Zed", ["0991112233"]))
+    assert book.parallel_search("zed") is None
+    book.start_scanner(wait=True)
+    assert book.parallel_search("zed") == ["Zed"]
@@ -0,0 +1,47 @@
+import pytest
+
+from address_book import AddressBook
+from conftest import check_index, make_book, make_record
+from indexes import PhoneIndex
+
+
+def test_index_after_changes():
+    book = make_book()
+    book.whois("0501234567")
+    book.find("Ann").edit_phone("0501234567", "0507654321")
+    book.find("Bob").remove_phone("0670000001")
+    book.add_record(make_record("Eve", ["0670000002"]))
+    book.add_record(make_record("Carl", ["0931112233"]))
+    book.delete("Dana")
+    check_index(book, PhoneIndex)
+    assert book.whois("0501234567") == []
+    assert book.whois("0507654321") == ["Ann"]
+    assert sorted(book.whois("0670000002")) == ["Bob", "Eve"]
+    assert book.whois("0931112233") == ["Carl"]
+
+
+@pytest.fixture
+def unique_phones(monkeypatch):
+    monkeypatch.setattr(AddressBook, "unique_phones", True)
+
+
+def test_unique_phones_are_checked(unique_phones):
+    book = make_book()
+    with pytest.raises(ValueError, match="belongs to Ann"):
+        book.add_record(make_record("Eve", ["0501234567"]))
+    with pytest.raises(ValueError, match="belongs to Ann"):
+        book.find("Dana").add_phone("0501234567")
+    with pytest.raises(ValueError, match="belongs to Bob"):
+        book.find("Dana").edit_phone("0931112233", "0670000001")
+    # The contact can have its own phone again
+    book.add_record(make_record("Ann", ["0501234567"]))
+    assert book.whois("0501234567") == ["Ann"]
+
+
+# Imported contacts are not checked, the journal restores them without the check too
+def test_journal_replay_keeps_shared_phones(storage_dir, unique_phones):
+    book = AddressBook().recover_address_book("journal")
+    book.add_records([make_record("Ann", ["0123456789"]), make_record("Bob", ["0123456789"])])
+    book = AddressBook().recover_address_book("journal")
+    assert list(book.data) == ["Ann", "Bob"]
+    assert book.whois("0123456789") == ["Ann", "Bob"]
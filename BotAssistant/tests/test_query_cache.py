@@ -0,0 +1,46 @@
+import address_book
+from conftest import make_book
+
+
+def test_repeated_query_is_cached():
+    book = make_book()
+    result = book.search_records("05")
+    assert book.search_records("05") is result
+    assert (book.cache_hits, book.cache_misses) == (1, 1)
+
+
+def test_cached_query_sees_changes():
+    book = make_book()
+    assert list(book.search_records("05").data) == ["Ann"]
+    book.find("Dana").add_phone("0501111111")
+    assert list(book.search_records("05").data) == ["Ann", "Dana"]
+    book.delete("Ann")
+    assert list(book.search_records("05").data) == ["Dana"]
+    assert book.cache_hits == 0
+
+
+def test_least_recently_used_result_is_dropped():
+    book = make_book()
+    book.query_cache_size = 2
+    first = book.search_records("05")
+    book.search_notes("tea")
+    book.search_records("05")
+    book.search_tag("work")
+    assert book.search_records("05") is first
+    # The result of search_notes was dropped
+    book.search_notes("tea")
+    assert book.cache_hits == 2 and book.cache_misses == 4
+
+
+def test_cache_can_be_disabled():
+    book = make_book()
+    book.query_cache_size = 0
+    assert book.search_records("05") is not book.search_records("05")
+    assert book.cache_hits == book.cache_misses == 0
+
+
+def test_large_results_are_not_cached(monkeypatch):
+    monkeypatch.setattr(address_book, "CACHED_RESULT_MAX", 1)
+    book = make_book()
+    assert book.search_records("0") is not book.search_records("0")
+    assert book.search_records("05") is book.search_records("05")
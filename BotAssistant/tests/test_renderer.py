@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+import address_book
+from bot import BotCLI
+from conftest import make_book
+import renderer
+from renderer import RendererFactory, TableRenderer, write_pages
+
+
+def print_book(book, output_format, **kwargs):
+    output = io.StringIO()
+    book.print_book(output_format=output_format, file=output, **kwargs)
+    return output.getvalue()
+
+
+def test_text_is_the_same_as_records(monkeypatch):
+    monkeypatch.setattr(address_book, "ROWS_PER_PAGE", 3)
+    book = make_book()
+    records = list(book.data.values())
+    expected = "page 1\n" + "".join(f"{record}\n" for record in records[:3]) + f"page 2\n{records[3]}\n"
+    assert print_book(book, "text") == expected
+
+
+def test_table_has_row_for_every_contact():
+    lines = print_book(make_book(), "table").splitlines()
+    assert lines[0].split() == ["Name", "Birthday", "Phones", "Notes"]
+    assert lines[2] == "page 1"
+    assert lines[3].split() == ["Ann", "1990-02-28", "0501234567", "likes", "tea", "#food"]
+    assert lines[4] == TableRenderer.ROW.format("Bob", "", "0670000001, 0670000002", "").rstrip()
+    assert lines[5].endswith("call back; owes money #work")
+    assert len(lines) == 7
+
+
+# All pages are one JSON array with the same fields as the export to JSONL
+@pytest.mark.parametrize("rows", [1, 3, 10])
+def test_json_is_array_of_contacts(monkeypatch, rows):
+    monkeypatch.setattr(address_book, "ROWS_PER_PAGE", rows)
+    contacts = json.loads(print_book(make_book(), "json"))
+    assert [contact["name"] for contact in contacts] == ["Ann", "Bob", "Carl", "Dana"]
+    assert contacts[2] == {"name": "Carl", "phones": [], "birthday": "2000-02-29",
+                           "notes": {"call back": "", "owes money": "work"}}
+
+
+def test_json_of_empty_book():
+    assert json.loads(print_book(address_book.AddressBook(), "json")) == []
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        RendererFactory().get_renderer("xml")
+
+
+# Pages are written in chunks of PAGES_PER_WRITE pages
+def test_pages_are_written_in_chunks(monkeypatch):
+    monkeypatch.setattr(renderer, "PAGES_PER_WRITE", 2)
+    writes = []
+
+    class Sink:
+        def write(self, text):
+            writes.append(text)
+
+    write_pages([[record] for record in make_book().data.values()], Sink(), RendererFactory().get_renderer("text"))
+    assert len(writes) == 3
+    assert "".join(writes).count("page ") == 4
+
+
+def test_format_command_changes_output_of_bot(capsys):
+    bot = BotCLI(phone_book=make_book())
+    bot.execute_command("format json")
+    capsys.readouterr()
+    bot.execute_command("show all")
+    assert len(json.loads(capsys.readouterr().out)) == 4
+    bot.execute_command("format xml")
+    assert "Unknown format xml" in capsys.readouterr().out
@@ -0,0 +1,61 @@
+from conftest import check_index, make_book, make_record
+from indexes import SearchIndex
+
+
+def make_indexed_book():
+    book = make_book()
+    book.search_records("ann")
+    assert SearchIndex in book._indexes
+    return book
+
+
+def test_index_after_add():
+    book = make_indexed_book()
+    book.add_record(make_record("Anna", ["0501234560"]))
+    book.add_records([make_record("Joanne", ["0440000000"]), make_record("Fay")])
+    check_index(book, SearchIndex)
+    assert list(book.search_records("ann").data) == ["Ann", "Anna", "Joanne"]
+    assert list(book.search_records("0440").data) == ["Joanne"]
+
+
+def test_index_after_edit():
+    book = make_indexed_book()
+    book.find("Ann").edit_phone("0501234567", "0507654321")
+    book.find("Bob").remove_phone("0670000001")
+    book.find("Dana").add_phone("0501234000")
+    check_index(book, SearchIndex)
+    assert list(book.search_records("501234").data) == ["Dana"]
+    assert list(book.search_records("7654").data) == ["Ann"]
+    assert list(book.search_records("0670000001").data) == []
+
+
+def test_index_after_delete():
+    book = make_indexed_book()
+    book.delete("Ann")
+    book.delete("Carl")
+    check_index(book, SearchIndex)
+    assert book.search_records("ann").data == {}
+
+
+# Replaced record is indexed with its new fields
+def test_index_after_replace():
+    book = make_indexed_book()
+    book.add_record(make_record("Bob", ["0631231234"]))
+    check_index(book, SearchIndex)
+    assert book.search_records("0670").data == {}
+    assert list(book.search_records("0631").data) == ["Bob"]
+
+
+# Texts shorter than trigram are searched without the index, results are in the same order
+def test_results_in_order_of_adding():
+    book = make_book()
+    book.add_record(make_record("Zed", ["0507000000"]))
+    book.add_record(make_record("Abe", ["0508000000"]))
+    book.delete("Ann")
+    book.add_record(make_record("Ann", ["0501234567"]))
+    expected = ["Dana", "Zed", "Abe", "Ann"]
+    assert list(book.search_records("05").data) == ["Zed", "Abe", "Ann"]
+    assert list(book.search_records("050").data) == ["Zed", "Abe", "Ann"]
+    assert list(book.search_records("0").data) == ["Bob"] + expected
+    assert list(book.search_records("00").data) == ["Bob", "Zed", "Abe"]
+    assert list(book.search_records("000").data) == ["Bob", "Zed", "Abe"]
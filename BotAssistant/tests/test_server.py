@@ -0,0 +1,108 @@
+import asyncio
+import sys
+
+import pytest
+
+from benchmarks.load_test import run_client
+from books import BookCache
+from bot import BotCLI
+from server import END_OF_RESPONSE, BotServer, SessionOutput
+
+
+# Server on Unix socket of the test directory, sessions send commands and get responses
+@pytest.fixture
+def serve(storage_dir, tmp_path, monkeypatch):
+    path = str(tmp_path / "bot.sock")
+
+    def serve(commands, files_dir=None, sessions=1):
+        bot_server = BotServer(BookCache("binary", autosave=False), workers=2, files_dir=files_dir)
+        # Set here: pytest replaces sys.stdout after fixtures are set up
+        bot_server.output = SessionOutput(sys.stdout)
+
+        async def session():
+            reader, writer = await asyncio.open_unix_connection(path)
+            responses = []
+            for command in commands:
+                writer.write(f"{command}\n".encode())
+                await writer.drain()
+                lines = []
+                while (line := await reader.readline()) and line.decode().rstrip("\n") != END_OF_RESPONSE:
+                    lines.append(line.decode().rstrip("\n"))
+                responses.append("\n".join(lines))
+            writer.close()
+            return responses
+
+        async def run():
+            server = await asyncio.start_unix_server(bot_server.handle_session, path)
+            async with server:
+                return await asyncio.gather(*(session() for _ in range(sessions)))
+
+        try:
+            with monkeypatch.context() as patch:
+                patch.setattr(sys, "stdout", bot_server.output)
+                return asyncio.run(run())
+        finally:
+            bot_server.executor.shutdown()
+            bot_server.books.close()
+
+    return serve
+
+
+def test_commands_get_responses(serve):
+    [responses] = serve(["add Ann 0501234567", "phone Ann", "use work", "phone Ann", "exit"])
+    assert responses[1] == " The contact Ann has phone numbers: ['0501234567']"
+    assert responses[2] == "Using address book work"
+    assert responses[3] == "Contact with such name (Ann) not present in Address Book."
+    assert responses[4] == "Good bye!"
+
+
+def test_sessions_share_the_book(serve):
+    serve(["add Ann 0501234567"], sessions=3)
+    [responses] = serve(["phone Ann"])
+    assert responses == [" The contact Ann has phone numbers: ['0501234567']"]
+
+
+def test_import_and_export_are_not_available_without_files_dir(serve, tmp_path):
+    [responses] = serve(["add Ann 0501234567", f"export {tmp_path / 'contacts.csv'}"])
+    assert responses[1] == "Import and export are not available"
+    assert not (tmp_path / "contacts.csv").exists()
+
+
+def test_files_outside_of_files_dir_are_rejected(serve, tmp_path):
+    files = tmp_path / "files"
+    files.mkdir()
+    [responses] = serve(["add Ann 0501234567", "export contacts.csv", "export ../contacts.csv",
+                         f"import {tmp_path / 'bot.sock'}"], files_dir=str(files))
+    assert responses[1] == "Exported 1 contacts to contacts.csv"
+    assert (files / "contacts.csv").exists()
+    assert "outside of the files directory" in responses[2]
+    assert "outside of the files directory" in responses[3]
+    assert not (tmp_path / "contacts.csv").exists()
+
+
+# Unexpected error of a command is the response, the session goes on
+def test_unhandled_error_is_sent_to_client(serve, monkeypatch):
+    def fail(self):
+        raise RuntimeError("broken")
+
+    monkeypatch.setitem(BotCLI.COMMANDS, "hello", fail)
+    [responses] = serve(["hello", "add Ann 0501234567", "phone Ann"])
+    assert responses[0] == "Unable to execute the command: broken"
+    assert responses[2] == " The contact Ann has phone numbers: ['0501234567']"
+
+
+# Load test client stops when the server closes the connection instead of waiting for the response
+def test_load_test_client_stops_on_closed_connection(storage_dir, tmp_path):
+    path = str(tmp_path / "closing.sock")
+
+    async def close_session(reader, writer):
+        await reader.readline()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_unix_server(close_session, path)
+        async with server:
+            await asyncio.wait_for(run_client(0, 5, 3, None, None, path), 5)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from address_book import AddressBook
+from conftest import make_book, make_record
+from db_connector import SQLiteDBConnector
+
+QUERIES = ["an", "ann", "ANN", "067", "0670000002", "ка", "каР", "o\"k", "nobody"]
+WORDS = [["tea"], ["money", "back"], ["ок"], ["зустріч"], ["te"], ["call", "ok"]]
+
+
+@pytest.fixture
+def book(storage_dir):
+    book = make_book(AddressBook().recover_address_book("sqlite"))
+    book.add_record(make_record("Карина", ["0995550011"], notes={"Зустріч у ПОНЕДІЛОК": "", "say \"ok\"": "work"}))
+    book.add_record(make_record("Mykola", ["0995550012"], notes={"TEA and coffee": "food"}))
+    return book
+
+
+def test_full_text_indexes_are_used(book):
+    assert book._connector.full_text
+
+
+# Full text indexes find the same contacts and notes as the scan of the tables
+def test_search_by_index_is_the_same_as_scan(book):
+    connector = book._connector
+    by_index = [connector.search_names(text) for text in QUERIES], [connector.notes_with_words(words) for words in WORDS]
+    connector.full_text = False
+    by_scan = [connector.search_names(text) for text in QUERIES], [connector.notes_with_words(words) for words in WORDS]
+    assert by_index == by_scan
+    assert by_index[0][5] == ["Карина"]
+    assert by_index[1][3] == {"Карина": {"Зустріч у ПОНЕДІЛОК": ""}}
+
+
+def test_changes_are_indexed(book):
+    book.find("Bob").remove_phone("0670000002")
+    book.find("Mykola").add_note("call Ann", "")
+    book.delete("Ann")
+    connector = book._connector
+    assert connector.search_names("0670000002") == []
+    assert connector.search_names("ann") == []
+    assert connector.notes_with_words(["call"]) == {"Carl": {"call back": ""}, "Mykola": {"call Ann": ""}}
+
+
+# Data base written before the indexes were added is indexed when it's opened
+def test_data_base_without_indexes_is_indexed(storage_dir):
+    connection = sqlite3.connect(SQLiteDBConnector.FILENAME)
+    connection.executescript(SQLiteDBConnector.SCHEMA)
+    connection.execute("INSERT INTO records (name, name_lower) VALUES ('Ann', 'ann')")
+    connection.execute("INSERT INTO phones (name, position, phone) VALUES ('Ann', 0, '0501234567')")
+    connection.execute("INSERT INTO notes (name, note, tag) VALUES ('Ann', 'likes tea', '')")
+    connection.commit()
+    connection.close()
+
+    connector = SQLiteDBConnector()
+    connector.connect()
+    assert connector.full_text
+    assert connector.search_names("ann") == ["Ann"]
+    assert connector.search_names("12345") == ["Ann"]
+    assert connector.notes_with_words(["tea"]) == {"Ann": {"likes tea": ""}}
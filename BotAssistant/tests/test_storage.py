@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from address_book import AddressBook, MmapRecords
+from conftest import book_state, make_book, make_record
+import db_connector
+from db_connector import JournalFileDBConnector
+
+STORAGE_TYPES = ["binary", "journal", "compact", "sqlite", "mmap"]
+
+
+def recover(storage_type):
+    return AddressBook().recover_address_book(storage_type)
+
+
+# Edit, add and delete contacts of the recovered book, so both new and loaded records are saved
+def change_book(book):
+    book.find("Ann").add_phone("0509999999")
+    book.find("Bob").edit_phone("0670000001", "0670000003")
+    book.find("Carl").edit_note("call back", "called")
+    book.find("Dana").add_birthday("1985-11-30")
+    book.delete("Bob")
+    book.add_record(make_record("Eve", ["0440000000"], notes={"new": "work"}))
+
+
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_round_trip(storage_dir, storage_type):
+    book = make_book(recover(storage_type))
+    expected = book_state(book)
+    book.save_address_book(storage_type)
+    assert book_state(recover(storage_type)) == expected
+
+
+@pytest.mark.parametrize("storage_type", STORAGE_TYPES)
+def test_changes_of_recovered_book(storage_dir, storage_type):
+    book = make_book(recover(storage_type))
+    book.save_address_book(storage_type)
+    book = recover(storage_type)
+    change_book(book)
+    expected = book_state(book)
+    book.save_address_book(storage_type)
+    assert book_state(recover(storage_type)) == expected
+    assert [name for name, _ in expected] == ["Ann", "Carl", "Dana", "Eve"]
+
+
+@pytest.mark.parametrize("storage_type", ["binary", "compact"])
+def test_failed_save_keeps_previous_book(storage_dir, storage_type, monkeypatch):
+    book = make_book(recover(storage_type))
+    book.save_address_book(storage_type)
+    expected = book_state(book)
+    book.delete("Ann")
+
+    def fail(source, destination):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db_connector.os, "replace", fail)
+        with pytest.raises(OSError):
+            book.save_address_book(storage_type)
+    assert book_state(recover(storage_type)) == expected
+
+
+# Changes are persisted without saving the book
+@pytest.mark.parametrize("storage_type", ["journal", "sqlite"])
+def test_changes_are_persisted_immediately(storage_dir, storage_type):
+    book = make_book(recover(storage_type))
+    change_book(book)
+    assert book_state(recover(storage_type)) == book_state(book)
+
+
+def test_mmap_keeps_unsaved_changes_in_memory(storage_dir):
+    book = make_book(recover("mmap"))
+    book.save_address_book("mmap")
+    book.delete("Ann")
+    assert "Ann" in recover("mmap").data
+    # The book maps the new file after saving, so it can be changed and saved again
+    book.save_address_book("mmap")
+    book.find("Bob").add_phone("0670000009")
+    book.save_address_book("mmap")
+    assert book_state(recover("mmap")) == book_state(book)
+
+
+# Records read from the file are cached up to CACHE_SIZE, changed records are kept until the book is saved
+def test_mmap_keeps_changed_records_only(storage_dir, monkeypatch):
+    monkeypatch.setattr(MmapRecords, "CACHE_SIZE", 2)
+    make_book(recover("mmap")).save_address_book("mmap")
+    book = recover("mmap")
+    ann = book.find("Ann")
+    ann.add_phone("0500000009")
+    for name in ["Bob", "Carl", "Dana"]:
+        book.find(name)
+    assert list(book.data.cache) == ["Carl", "Dana"]
+    assert book.find("Ann") is ann
+    book.save_address_book("mmap")
+    assert book.data.changed == {}
+    assert len(book.data.cache) == 2
+    assert recover("mmap").find("Ann").phone_numbers() == ["0501234567", "0500000009"]
+
+
+def test_journal_truncated_entry_is_dropped(storage_dir):
+    connector = JournalFileDBConnector()
+    book = make_book(recover("journal"))
+    journal = connector.journal_filename()
+    size = os.path.getsize(journal)
+    book.add_record(make_record("Eve", ["0440000000"]))
+    expected = book_state(book)[:-1]
+    # Crash while the last entry was written
+    with open(journal, "r+b") as file:
+        file.truncate(size + (os.path.getsize(journal) - size) // 2)
+
+    book = recover("journal")
+    assert book_state(book) == expected
+    assert os.path.getsize(journal) == size
+    # New entries are appended after the last complete entry
+    book.add_record(make_record("Fay", ["0440000001"]))
+    assert book_state(recover("journal")) == book_state(book)
+
+
+def test_journal_compaction(storage_dir):
+    connector = JournalFileDBConnector(compact_every=3)
+    book = AddressBook()
+    book._connector = connector
+    # The journal is compacted when it has as many entries as the book has records (Ann, Bob, Carl),
+    # only Dana is appended to the journal after it
+    make_book(book)
+    assert os.path.isfile(connector.filename)
+    assert connector.entries == 1
+    # The threshold grows with the book
+    book.add_record(make_record("Eve"))
+    book.add_record(make_record("Fay"))
+    assert connector.entries == 3
+    assert book_state(recover("journal")) == book_state(book)